@@ -4,7 +4,7 @@ Administration endpoints.
 
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, status
 
 from soauth.core.group import GroupData
 from soauth.core.models import (
@@ -16,13 +16,12 @@ from soauth.core.uuid import UUID
 from soauth.service import groups as group_service
 from soauth.service import refresh as refresh_service
 from soauth.service import user as user_service
-from soauth.toolkit.fastapi import SOUserWithGrants, handle_authenticated_user
+from soauth.toolkit.fastapi import AuthenticatedUserDependency, SOUserWithGrants
 
 from .dependencies import DatabaseDependency, LoggerDependency
 
 
-async def handle_admin_user(request: Request) -> SOUserWithGrants:
-    user = await handle_authenticated_user(request=request)
+async def handle_admin_user(user: AuthenticatedUserDependency) -> SOUserWithGrants:
 
     if "admin" not in user.grants:
         raise HTTPException(
@@ -20,6 +20,7 @@ from .keys import key_management_routes
 from .login import login_app
 
 settings = SETTINGS()
+settings.configure_logging()
 
 
 async def lifespan(app: FastAPI):
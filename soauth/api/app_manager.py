@@ -4,7 +4,7 @@ Endpoints for managing Apps created in the identity system.
 
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 
 from soauth.core.app import AppData
@@ -13,7 +13,7 @@ from soauth.core.uuid import UUID
 from soauth.service import app as app_service
 from soauth.service import refresh as refresh_service
 from soauth.service import user as user_service
-from soauth.toolkit.fastapi import SOUserWithGrants, handle_authenticated_user
+from soauth.toolkit.fastapi import AuthenticatedUserDependency, SOUserWithGrants
 
 from .dependencies import DatabaseDependency, LoggerDependency, SettingsDependency
 
@@ -23,8 +23,9 @@ CANNOT_MANAGE_THIS_APP = HTTPException(
 )
 
 
-async def handle_app_manager_user(request: Request) -> SOUserWithGrants:
-    user = await handle_authenticated_user(request=request)
+async def handle_app_manager_user(
+    user: AuthenticatedUserDependency,
+) -> SOUserWithGrants:
 
     if "admin" in user.grants or "appmanager" in user.grants:
         return user
@@ -9,6 +9,7 @@ from pydantic import BaseModel
 
 from soauth.api.dependencies import DatabaseDependency, LoggerDependency
 from soauth.core.group import GroupData
+from soauth.core.names import normalize_name
 from soauth.service import groups as groups_service
 from soauth.toolkit.fastapi import AuthenticatedUserDependency
 
@@ -123,7 +124,7 @@ async def create_group(
     """
     Create a new group.
     """
-    group_name = content.group_name.strip().lower().replace(" ", "_")
+    group_name = normalize_name(content.group_name)
     member_ids = content.member_ids
     grants = content.grants.strip()
 
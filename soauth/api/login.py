@@ -349,7 +349,7 @@ async def expire_by_id(
         )
 
         if refresh_key.user_id != user.user_id:
-            log.ainfo("api.login.expire.user_id_mismatch")
+            await log.ainfo("api.login.expire.user_id_mismatch")
             raise refresh_service.AuthorizationError("Not your key")
     except refresh_service.AuthorizationError:
         await log.ainfo("api.login.expire.disallowed")
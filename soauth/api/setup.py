@@ -31,6 +31,8 @@ def initial_setup(settings: Settings):
     manager = settings.sync_manager()
     manager.create_all()
 
+    now = datetime.now(timezone.utc)
+
     with manager.session() as conn:
         user = User(user_name=settings.initial_admin, grants="admin")
 
@@ -38,7 +40,7 @@ def initial_setup(settings: Settings):
             group_name=user.user_name,
             created_by_user_id=user.user_id,
             created_by=user,
-            created_at=datetime.now(timezone.utc),
+            created_at=now,
             members=[user],
         )
 
@@ -51,7 +53,7 @@ def initial_setup(settings: Settings):
             api_access=False,
             created_by_user_id=user.user_id,
             created_by=user,
-            created_at=datetime.now(timezone.utc),
+            created_at=now,
             domain=settings.hostname,
             key_pair_type=settings.key_pair_type,
             public_key=public,
@@ -103,6 +105,8 @@ def example_setup(settings: Settings):
 
     manager.create_all()
 
+    now = datetime.now(timezone.utc)
+
     with manager.session() as conn:
         user = User(
             full_name="Example User",
@@ -115,7 +119,7 @@ def example_setup(settings: Settings):
             group_name="example_user",
             created_by_user_id=user.user_id,
             created_by=user,
-            created_at=datetime.now(timezone.utc),
+            created_at=now,
             members=[user],
         )
 
@@ -127,7 +131,7 @@ def example_setup(settings: Settings):
             api_access=False,
             created_by_user_id=user.user_id,
             created_by=user,
-            created_at=datetime.now(timezone.utc),
+            created_at=now,
             domain="http://localhost:8001",
             key_pair_type=settings.key_pair_type,
             public_key=public,
@@ -145,7 +149,7 @@ def example_setup(settings: Settings):
                 group_name=admin_user,
                 created_by_user_id=new_user.user_id,
                 created_by=new_user,
-                created_at=datetime.now(timezone.utc),
+                created_at=now,
                 members=[new_user],
             )
             conn.add_all([new_user, new_group])
@@ -155,7 +159,7 @@ def example_setup(settings: Settings):
             api_access=True,
             created_by_user_id=user.user_id,
             created_by=user,
-            created_at=datetime.now(timezone.utc),
+            created_at=now,
             domain="http://simonsobs.org",
             key_pair_type=settings.key_pair_type,
             public_key=public,
@@ -20,6 +20,7 @@ from .keys import router as key_router
 from .users import router as user_router
 
 settings = Settings()
+settings.configure_logging()
 
 if (not settings.create_files) and settings.create_example_app_and_user:
     # Running in example mode; grab data
@@ -6,6 +6,7 @@ from datetime import timedelta
 from pathlib import Path
 from typing import Literal
 
+import structlog
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from sqlalchemy import URL
 
@@ -24,6 +25,8 @@ class Settings(BaseSettings):
 
     database_echo: bool = False
 
+    log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = "DEBUG"
+
     # Example/testing setup
     create_example_app_and_user: bool = False
     created_app_public_key: str | bytes | None = None
@@ -113,3 +116,13 @@ class Settings(BaseSettings):
         return AsyncSessionManager(
             connection_url=self.async_uri, echo=self.database_echo
         )
+
+    def configure_logging(self):
+        """
+        Configure structlog to drop events below `log_level` without
+        formatting them, and to cache loggers after their first use.
+        """
+        structlog.configure(
+            wrapper_class=structlog.make_filtering_bound_logger(self.log_level),
+            cache_logger_on_first_use=True,
+        )
@@ -2,33 +2,151 @@
 One-stop functionality for decoding access tokens
 """
 
-from cachetools import TTLCache, cached
+import asyncio
+import hashlib
+import threading
+import time
+from functools import lru_cache
+
+from cachetools import TTLCache
+from cryptography.hazmat.primitives.asymmetric.types import PublicKeyTypes
 from pydantic import ValidationError
 
-from soauth.core.tokens import KeyDecodeError, reconstruct_payload
+from soauth.core.cryptography import (
+    EncryptionSerializationError,
+    deserialize_public_key,
+)
+from soauth.core.tokens import KeyDecodeError, KeyExpiredError, reconstruct_payload
 from soauth.core.user import UserData
 
 
-@cached(cache=TTLCache(maxsize=256, ttl=600))
-def decode_access_token(
-    encrypted_access_token: str | bytes, public_key: str | bytes, key_pair_type: str
-) -> UserData:
+@lru_cache(maxsize=16)
+def load_public_key(public_key: str | bytes) -> PublicKeyTypes:
     """
+    Parse a PEM public key once; services only ever verify against a handful
+    of keys, so the parsed object is kept for the lifetime of the process.
+    Call this at startup to both warm the cache and reject a bad key early.
+
     Raises
     ------
     KeyDecodeError
-        When there is a problem decoding the key
-    KeyExpiredError
-        When the key has expired
+        When the public key cannot be deserialized
     """
+    if isinstance(public_key, str):
+        public_key = public_key.encode("utf-8")
+
+    try:
+        return deserialize_public_key(public_key=public_key)
+    except EncryptionSerializationError:
+        raise KeyDecodeError("Unable to deserialize public key")
+
+
+# Decoded tokens, keyed by a digest of the token (so that raw tokens are not
+# kept alive in memory) and the key used to verify it, alongside the expiry
+# time of the token so that we never serve an expired token from the cache.
+# TTLCache is not threadsafe, and decode_access_token may be called from
+# worker threads.
+_DECODE_CACHE: TTLCache[tuple[bytes, str | bytes, str], tuple[UserData, float]] = (
+    TTLCache(maxsize=4096, ttl=600)
+)
+_DECODE_CACHE_LOCK = threading.Lock()
+
+
+def _cache_key(
+    encrypted_access_token: str | bytes, public_key: str | bytes, key_pair_type: str
+) -> tuple[bytes, str | bytes, str]:
+    token_bytes = (
+        encrypted_access_token.encode("utf-8")
+        if isinstance(encrypted_access_token, str)
+        else encrypted_access_token
+    )
+
+    # A JWS compact serialization is always three dot-separated segments;
+    # reject anything else (stale cookies, scanners) before hashing or
+    # touching the crypto.
+    if token_bytes.count(b".") != 2:
+        raise KeyDecodeError("Access token is not a JWT")
+
+    return (hashlib.sha256(token_bytes).digest(), public_key, key_pair_type)
+
+
+def _cached_user(cache_key: tuple[bytes, str | bytes, str]) -> UserData | None:
+    with _DECODE_CACHE_LOCK:
+        hit = _DECODE_CACHE.get(cache_key)
+
+        if hit is not None and hit[1] <= time.time():
+            _DECODE_CACHE.pop(cache_key, None)
+            raise KeyExpiredError("Content of the payload has expired")
+
+    return None if hit is None else hit[0]
+
 
+def _decode_and_cache(
+    cache_key: tuple[bytes, str | bytes, str],
+    encrypted_access_token: str | bytes,
+    public_key: str | bytes,
+    key_pair_type: str,
+) -> UserData:
     payload = reconstruct_payload(
         webtoken=encrypted_access_token,
-        public_key=public_key,
+        public_key=load_public_key(public_key),
         key_pair_type=key_pair_type,
     )
 
     try:
-        return UserData.model_validate(payload)
+        user_data = UserData.model_validate(payload)
     except ValidationError:
         raise KeyDecodeError("Error reconstructing the user model")
+
+    with _DECODE_CACHE_LOCK:
+        _DECODE_CACHE[cache_key] = (user_data, payload.get("exp", float("inf")))
+
+    return user_data
+
+
+def decode_access_token(
+    encrypted_access_token: str | bytes, public_key: str | bytes, key_pair_type: str
+) -> UserData:
+    """
+    Raises
+    ------
+    KeyDecodeError
+        When there is a problem decoding the key
+    KeyExpiredError
+        When the key has expired
+    """
+
+    cache_key = _cache_key(encrypted_access_token, public_key, key_pair_type)
+
+    if (user_data := _cached_user(cache_key)) is not None:
+        return user_data
+
+    return _decode_and_cache(
+        cache_key, encrypted_access_token, public_key, key_pair_type
+    )
+
+
+async def async_decode_access_token(
+    encrypted_access_token: str | bytes, public_key: str | bytes, key_pair_type: str
+) -> UserData:
+    """
+    As `decode_access_token`, but when the token is not already cached the
+    signature verification is run in a worker thread rather than on the
+    event loop.
+
+    Raises
+    ------
+    KeyDecodeError
+        When there is a problem decoding the key
+    KeyExpiredError
+        When the key has expired
+    """
+
+    cache_key = _cache_key(encrypted_access_token, public_key, key_pair_type)
+
+    if (user_data := _cached_user(cache_key)) is not None:
+        return user_data
+
+    return await asyncio.to_thread(
+        _decode_and_cache, cache_key, encrypted_access_token, public_key, key_pair_type
+    )
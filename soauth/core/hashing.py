@@ -4,7 +4,7 @@ Utilities for hashing and comparing hashes.
 
 from __future__ import annotations
 
-import hashlib
+from typing import Callable
 
 import xxhash
 
@@ -13,10 +13,15 @@ class UnsupportedHashAlgorithm(Exception):
     pass
 
 
-def match_name_to_algorithm(name: str) -> hashlib._Hash:
+def match_name_to_algorithm(name: str) -> Callable[[bytes], str]:
+    """
+    Return the one-shot hex digest function for a named algorithm. These
+    hash the whole input in a single call, without building an intermediate
+    hasher object.
+    """
     match name:
         case "xxh3":
-            return xxhash.xxh3_64
+            return xxhash.xxh3_64_hexdigest
         case _:
             raise UnsupportedHashAlgorithm(f"Algorithm {name} not supported")
 
@@ -29,7 +34,10 @@ def checksum(content: str | bytes, hash_algorithm: str) -> str:
     """
     algorithm = match_name_to_algorithm(hash_algorithm)
 
-    return algorithm(content).hexdigest()
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+
+    return algorithm(content)
 
 
 def compare(content: str | bytes, compare_to: str, hash_algorithm: str) -> bool:
@@ -37,6 +45,6 @@ def compare(content: str | bytes, compare_to: str, hash_algorithm: str) -> bool:
     Compare some content (hashed with hash_algorithm) to a pre-existing checksum
     (`compare_to`).
     """
-    new_hash = hash(content=content, hash_algorithm=hash_algorithm)
+    new_hash = checksum(content=content, hash_algorithm=hash_algorithm)
 
     return compare_to == new_hash
@@ -0,0 +1,11 @@
+"""
+Normalization of user names, group names, and grants
+"""
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a user name, group name, or grant: surrounding whitespace is
+    removed, the name is lower-cased, and internal spaces become underscores.
+    """
+    return name.strip().lower().replace(" ", "_")
@@ -6,6 +6,10 @@ from datetime import datetime, timedelta, timezone
 from typing import Any
 
 import jwt
+from cryptography.hazmat.primitives.asymmetric.types import (
+    PrivateKeyTypes,
+    PublicKeyTypes,
+)
 
 from soauth.core.uuid import UUID, uuid7
 
@@ -48,7 +52,7 @@ def filter_payload_item_for_serialization(p) -> Any:
 def sign_payload(
     app_id: UUID,
     key_password: str,
-    private_key: bytes,
+    private_key: bytes | PrivateKeyTypes,
     key_pair_type: str,
     payload: dict[str, Any],
 ) -> str:
@@ -63,14 +67,21 @@ def sign_payload(
     key_password
         The main password for the keys.
     private_key
-        The encrypted private key.
+        The encrypted private key, or one that has already been decrypted
+        and deserialized (in which case `key_password` is not used).
     key_pair_type
         The type of key (e.g. Ed25519).
     payload
         The payload for the JWT to encrpyt.
     """
 
-    key = deserialize_private_key(private_key=private_key, key_password=key_password)
+    if isinstance(private_key, (str, bytes)):
+        key = deserialize_private_key(
+            private_key=private_key, key_password=key_password
+        )
+    else:
+        key = private_key
+
     algorithm = match_key_pair_type_to_pyjwt_algorithm(key_pair_type=key_pair_type)
 
     encrypted = jwt.encode(
@@ -106,7 +117,7 @@ def app_id_from_signed_payload(webtoken: str | bytes) -> int:
 
 
 def reconstruct_payload(
-    webtoken: str | bytes, public_key: bytes, key_pair_type: str
+    webtoken: str | bytes, public_key: bytes | PublicKeyTypes, key_pair_type: str
 ) -> dict[str, Any]:
     """
     Reconstruct a JWT payload; requires reconstituting the public key and using it.
@@ -114,13 +125,18 @@ def reconstruct_payload(
     Paramaters
     ----------
     public_key
-        The serialized public key.
+        The serialized public key, or one that has already been deserialized
+        (in which case the PEM parsing step is skipped).
     key_pair_type
         The type of key (e.g. Ed25519).
     """
 
     try:
-        key = deserialize_public_key(public_key=public_key)
+        if isinstance(public_key, (str, bytes)):
+            key = deserialize_public_key(public_key=public_key)
+        else:
+            key = public_key
+
         algorithm = match_key_pair_type_to_pyjwt_algorithm(key_pair_type=key_pair_type)
 
         payload = jwt.decode(
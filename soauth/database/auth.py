@@ -5,15 +5,37 @@ ORM for authentication data
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Column, DateTime
+from sqlalchemy import Column, DateTime, Index, text
 from sqlmodel import Field, Relationship, SQLModel
 
 from soauth.core.uuid import UUID, uuid7
 from soauth.database.app import App
 from soauth.database.user import User
 
+# Partial indexes over the active keys only, for the lookups made when
+# starting a new web session (expiring the previous one) and when listing
+# a user's logins.
+_ACTIVE_WEB_SESSION = text("revoked = false AND api_key = false")
+_ACTIVE = text("revoked = false")
+
 
 class RefreshKey(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_refreshkey_user_app_active",
+            "user_id",
+            "app_id",
+            postgresql_where=_ACTIVE_WEB_SESSION,
+            sqlite_where=_ACTIVE_WEB_SESSION,
+        ),
+        Index(
+            "ix_refreshkey_user_active",
+            "user_id",
+            postgresql_where=_ACTIVE,
+            sqlite_where=_ACTIVE,
+        ),
+    )
+
     refresh_key_id: UUID = Field(primary_key=True, default_factory=uuid7)
 
     user_id: UUID = Field(foreign_key="user.user_id", ondelete="CASCADE")
@@ -9,6 +9,7 @@ from sqlalchemy import Column, DateTime
 from sqlmodel import Field, Relationship, SQLModel
 
 from soauth.core.group import GroupData
+from soauth.core.names import normalize_name
 from soauth.core.uuid import UUID, uuid7
 
 if TYPE_CHECKING:
@@ -47,7 +48,7 @@ class Group(SQLModel, table=True):
         """
         Check if this group posseses the grant `grant`.
         """
-        grant = grant.strip().lower().replace(" ", "_")
+        grant = normalize_name(grant)
 
         if self.grants is None:
             return False
@@ -57,7 +58,7 @@ class Group(SQLModel, table=True):
         """
         Add a grant to the list this group possesses.
         """
-        grant = grant.strip().lower().replace(" ", "_")
+        grant = normalize_name(grant)
 
         if self.has_grant(grant):
             return
@@ -72,7 +73,7 @@ class Group(SQLModel, table=True):
         """
         Remove a grant from the list this user possesses.
         """
-        grant = grant.strip().lower().replace(" ", "_")
+        grant = normalize_name(grant)
         if not self.has_grant(grant):
             return
 
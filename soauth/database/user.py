@@ -8,6 +8,7 @@ from typing import TYPE_CHECKING
 from sqlalchemy import Column, DateTime
 from sqlmodel import Field, Relationship, SQLModel
 
+from soauth.core.names import normalize_name
 from soauth.core.user import UserData
 from soauth.core.uuid import UUID, uuid7
 from soauth.database.group import GroupMembership
@@ -54,7 +55,7 @@ class User(SQLModel, table=True):
         """
         Check if this user posseses the grant `grant`.
         """
-        grant = grant.strip().lower().replace(" ", "_")
+        grant = normalize_name(grant)
 
         if self.grants is None:
             return False
@@ -68,7 +69,7 @@ class User(SQLModel, table=True):
         Note that all changes to the local copy of this data (as performed by
         this function) must be committed to the database separately.
         """
-        grant = grant.strip().lower().replace(" ", "_")
+        grant = normalize_name(grant)
 
         if self.has_grant(grant):
             return
@@ -87,7 +88,7 @@ class User(SQLModel, table=True):
         Note that all changes to the local copy of this data (as performed by
         this function) must be committed to the database separately.
         """
-        grant = grant.strip().lower().replace(" ", "_")
+        grant = normalize_name(grant)
 
         if not self.has_grant(grant):
             return
@@ -112,7 +113,13 @@ class User(SQLModel, table=True):
 
     def has_effective_grant(self, grant: str) -> bool:
         """Check if user has grant either individually or through groups."""
-        return grant in self.get_effective_grants()
+        # Stops at the first match rather than building the full set.
+        if self.grants and grant in self.grants.split():
+            return True
+
+        return any(
+            group.grants and grant in group.grants.split() for group in self.groups
+        )
 
     def to_public_profile_data(self) -> dict[str, str | None]:
         """Convert user data to public profile format."""
@@ -15,6 +15,7 @@ from soauth.core.random import client_secret
 from soauth.core.uuid import UUID
 from soauth.database.app import App
 from soauth.database.user import User
+from soauth.service.refresh import invalidate_app_key_cache
 
 
 class AppNotFound(Exception):
@@ -125,7 +126,6 @@ async def read_by_id(app_id: UUID, conn: AsyncSession) -> App:
 async def refresh_keys(
     app_id: UUID, settings: Settings, conn: AsyncSession, log: FilteringBoundLogger
 ) -> App:
-    log = log.bind(app_id=app_id, key_pair_type=settings.key_pair_type)
     app = await read_by_id(app_id=app_id, conn=conn)
 
     public_key, private_key = generate_key_pair(
@@ -138,8 +138,11 @@ async def refresh_keys(
     app.client_secret = client_secret()
 
     conn.add(app)
+    invalidate_app_key_cache(app_id=app.app_id, conn=conn)
 
-    await log.ainfo("app.key_refreshed")
+    await log.ainfo(
+        "app.key_refreshed", app_id=app_id, key_pair_type=settings.key_pair_type
+    )
 
     return app
 
@@ -154,6 +157,7 @@ async def delete(app_id: UUID, conn: AsyncSession, log: FilteringBoundLogger) ->
     )
 
     await conn.delete(app)
+    invalidate_app_key_cache(app_id=app.app_id, conn=conn)
 
     await log.ainfo("app.deleted")
 
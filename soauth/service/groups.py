@@ -10,6 +10,7 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from structlog.typing import FilteringBoundLogger
 
+from soauth.core.names import normalize_name
 from soauth.core.uuid import UUID
 from soauth.database.group import Group
 
@@ -54,7 +55,7 @@ async def create(
         If a group with this name already exists.
     """
 
-    group_name = group_name.strip().lower().replace(" ", "_")
+    group_name = normalize_name(group_name)
 
     log = log.bind(
         group_name=group_name,
@@ -119,7 +120,6 @@ async def get_group_list(
     list[Group]
         A list of all groups in the database.
     """
-    log = log.bind(for_user=for_user)
     if for_user:
         result = await conn.execute(
             select(Group).join(Group.members).where(Group.members.any(user_id=for_user))
@@ -128,7 +128,7 @@ async def get_group_list(
         result = await conn.execute(select(Group))
 
     groups = result.unique().scalars().all()
-    await log.adebug("group.listed", number_of_groups=len(groups))
+    await log.adebug("group.listed", for_user=for_user, number_of_groups=len(groups))
     return groups
 
 
@@ -154,13 +154,12 @@ async def read_by_id(
     GroupNotFound
         If the group does not exist.
     """
-    log = log.bind(group_id=group_id)
     result = await conn.execute(select(Group).where(Group.group_id == group_id))
     group = result.unique().scalar_one_or_none()
     if not group:
-        await log.ainfo("group.not_found")
+        await log.ainfo("group.not_found", group_id=group_id)
         raise GroupNotFound(f"Group with id {group_id} not found")
-    await log.adebug("group.found")
+    await log.adebug("group.found", group_id=group_id)
     return group
 
 
@@ -186,14 +185,13 @@ async def read_by_name(
     GroupNotFound
         If the group does not exist.
     """
-    group_name = group_name.strip().lower().replace(" ", "_")
-    log = log.bind(group_name=group_name)
+    group_name = normalize_name(group_name)
     result = await conn.execute(select(Group).where(Group.group_name == group_name))
     group = result.unique().scalar_one_or_none()
     if not group:
-        await log.ainfo("group.not_found")
+        await log.ainfo("group.not_found", group_name=group_name)
         raise GroupNotFound(f"Group with name {group_name} not found")
-    await log.adebug("group.found")
+    await log.adebug("group.found", group_name=group_name)
     return group
 
 
@@ -224,7 +222,7 @@ async def add_member_by_name(
     user_service.UserNotFound
         If the user does not exist.
     """
-    group_name = group_name.strip().lower().replace(" ", "_")
+    group_name = normalize_name(group_name)
     log = log.bind(group_name=group_name, user_id=user_id)
     group = await read_by_name(group_name, conn, log)
     return await add_member(group.group_id, user_id, conn, log)
@@ -296,7 +294,7 @@ async def remove_member_by_name(
     user_service.UserNotFound
         If the user does not exist.
     """
-    group_name = group_name.strip().lower().replace(" ", "_")
+    group_name = normalize_name(group_name)
     log = log.bind(group_name=group_name, user_id=user_id)
     group = await read_by_name(group_name, conn, log)
     return await remove_member(group.group_id, user_id, conn, log)
@@ -363,9 +361,8 @@ async def delete_group(
     GroupNotFound
         If the group does not exist.
     """
-    log = log.bind(group_id=group_id)
     await conn.execute(delete(Group).where(Group.group_id == group_id))
-    await log.ainfo("group.deleted")
+    await log.ainfo("group.deleted", group_id=group_id)
 
 
 async def add_grant(
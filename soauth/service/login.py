@@ -63,8 +63,6 @@ async def create(
     location.
     """
 
-    log = log.bind(app_id=app.app_id, redirect_to=redirect_to)
-
     request = LoginRequest(
         app_id=app.app_id,
         redirect_to=redirect_to,
@@ -73,7 +71,7 @@ async def create(
 
     conn.add(request)
 
-    await log.ainfo("login.request_created")
+    await log.ainfo("login.request_created", app_id=app.app_id, redirect_to=redirect_to)
 
     return request
 
@@ -44,7 +44,7 @@ class MockProvider(AuthProvider):
         try:
             user = await user_service.read_by_name(user_name=self.user_name, conn=conn)
         except user_service.UserNotFound:
-            user = await user_service.create_user(
+            user = await user_service.create(
                 user_name=self.user_name,
                 email=self.email,
                 full_name=self.full_name,
@@ -54,8 +54,6 @@ class MockProvider(AuthProvider):
                 log=log,
             )
 
-        conn.add(user)
-
         return user
 
     async def refresh(
@@ -69,6 +67,4 @@ class MockProvider(AuthProvider):
         user.email = self.email
         user.grants = self.grants
 
-        conn.add(user)
-
         return user
@@ -2,15 +2,28 @@
 Core functions for the auth flow, including connections to the GitHub APIs.
 """
 
+import asyncio
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Iterable
 
-from sqlalchemy import false, select
+from cachetools import TTLCache
+from cryptography.hazmat.primitives.asymmetric.types import (
+    PrivateKeyTypes,
+    PublicKeyTypes,
+)
+from pydantic import TypeAdapter
+from sqlalchemy import event, false, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from structlog.typing import FilteringBoundLogger
 
 from soauth.config.settings import Settings
 from soauth.core.app import LoggedInUserData
+from soauth.core.cryptography import (
+    EncryptionSerializationError,
+    deserialize_private_key,
+    deserialize_public_key,
+)
 from soauth.core.hashing import checksum
 from soauth.core.tokens import (
     KeyDecodeError,
@@ -24,7 +37,6 @@ from soauth.core.uuid import UUID
 from soauth.database.app import App
 from soauth.database.auth import RefreshKey
 from soauth.database.user import User
-from soauth.service import user as user_service
 from soauth.service.provider import AuthProvider
 
 
@@ -32,27 +44,122 @@ class AuthorizationError(Exception):
     pass
 
 
-async def expire_refresh_keys(user: User, app: App, conn: AsyncSession):
+# Verification material for each app: the already-deserialized public key
+# and its key pair type. App keys rotate rarely, so this saves a database
+# round-trip and a PEM parse on every decode; entries are dropped on
+# rotation or deletion through `invalidate_app_key_cache`, and the TTL
+# bounds staleness across workers.
+_APP_KEY_CACHE: TTLCache[UUID, tuple[PublicKeyTypes, str]] = TTLCache(
+    maxsize=64, ttl=60
+)
+
+
+# Decrypted signing keys for each app, alongside the encrypted key they were
+# loaded from. Decrypting the stored private key costs far more than the
+# Ed25519 signature itself, and has to happen on every key refresh. The
+# encrypted key is compared on lookup, so a rotated key is never used even
+# before its entry expires.
+_SIGNING_KEY_CACHE: TTLCache[UUID, tuple[bytes, PrivateKeyTypes]] = TTLCache(
+    maxsize=64, ttl=600
+)
+
+
+# Bumped on every invalidation, so that a verifier loaded from the database
+# while a rotation was being committed is not put back into the cache.
+_APP_KEY_GENERATION = 0
+
+
+def invalidate_app_key_cache(app_id: UUID, conn: AsyncSession | None = None):
     """
-    Expires all refresh keys for a given user/app combination.
+    Drop the cached verification key for an app, e.g. after its keys have
+    been rotated. If `conn` is given, this happens once its transaction
+    commits: until then the old key is still the committed one, and any
+    concurrent decode would simply load and cache it again.
     """
-    query = select(RefreshKey).filter(
-        RefreshKey.user_id == user.user_id,
-        RefreshKey.app_id == app.app_id,
-        RefreshKey.revoked == false(),
-        # We only care about restricting keys used for web sessions;
-        # users can have as many API keys as they wish active at any
-        # given time. They are responsible for managing them.
-        RefreshKey.api_key == false(),
+    if conn is not None:
+        event.listen(
+            conn.sync_session,
+            "after_commit",
+            lambda session: invalidate_app_key_cache(app_id=app_id),
+            once=True,
+        )
+        return
+
+    global _APP_KEY_GENERATION
+    _APP_KEY_GENERATION += 1
+
+    _APP_KEY_CACHE.pop(app_id, None)
+    _SIGNING_KEY_CACHE.pop(app_id, None)
+
+
+async def _get_verifier(app_id: UUID, conn: AsyncSession) -> tuple[PublicKeyTypes, str]:
+    """
+    Get the deserialized public key and key pair type for an app, from the
+    cache if possible.
+    """
+    if (verifier := _APP_KEY_CACHE.get(app_id)) is not None:
+        return verifier
+
+    generation = _APP_KEY_GENERATION
+    app = await conn.get(App, app_id)
+
+    if app is None:
+        raise AuthorizationError(f"No app with ID {app_id}")
+
+    try:
+        public_key = deserialize_public_key(public_key=app.public_key)
+    except EncryptionSerializationError:
+        raise AuthorizationError(f"Unable to load public key for app {app_id}")
+
+    verifier = (public_key, app.key_pair_type)
+
+    if generation == _APP_KEY_GENERATION:
+        _APP_KEY_CACHE[app_id] = verifier
+
+    return verifier
+
+
+async def _get_signing_key(app: App, settings: Settings) -> PrivateKeyTypes:
+    """
+    Get the decrypted private key for an app, from the cache if possible.
+    Decryption on a miss runs in a worker thread.
+    """
+    cached = _SIGNING_KEY_CACHE.get(app.app_id)
+
+    if cached is not None and cached[0] == app.private_key:
+        return cached[1]
+
+    private_key = await asyncio.to_thread(
+        deserialize_private_key,
+        private_key=app.private_key,
+        key_password=settings.key_password,
     )
+    _SIGNING_KEY_CACHE[app.app_id] = (app.private_key, private_key)
 
-    all_unexpired = (await conn.execute(query)).scalars().all()
+    return private_key
 
-    for key in all_unexpired:
-        key.last_used = datetime.now(timezone.utc)
-        key.revoked = True
 
-        conn.add(key)
+async def expire_refresh_keys(user: User, app: App, conn: AsyncSession):
+    """
+    Expires all refresh keys for a given user/app combination.
+    """
+    # A single UPDATE revokes every matching key, however many there are,
+    # rather than loading them and flushing one UPDATE per row.
+    query = (
+        update(RefreshKey)
+        .where(
+            RefreshKey.user_id == user.user_id,
+            RefreshKey.app_id == app.app_id,
+            RefreshKey.revoked == false(),
+            # We only care about restricting keys used for web sessions;
+            # users can have as many API keys as they wish active at any
+            # given time. They are responsible for managing them.
+            RefreshKey.api_key == false(),
+        )
+        .values(revoked=True, last_used=datetime.now(timezone.utc))
+    )
+
+    await conn.execute(query)
 
     return
 
@@ -81,10 +188,12 @@ async def create_refresh_key(
     expiry_time = payload["exp"]
     uuid = payload["uuid"]
 
-    content = sign_payload(
+    # Signing is CPU-bound, so as with verification it runs off the loop.
+    content = await asyncio.to_thread(
+        sign_payload,
         app_id=app.app_id,
         key_password=settings.key_password,
-        private_key=app.private_key,
+        private_key=await _get_signing_key(app=app, settings=settings),
         key_pair_type=app.key_pair_type,
         payload=payload,
     )
@@ -126,22 +235,22 @@ async def decode_refresh_key(
     """
 
     try:
-        app_id = app_id_from_signed_payload(encoded_payload)
-    except KeyDecodeError:
+        app_id = UUID(hex=app_id_from_signed_payload(encoded_payload))
+    except (KeyDecodeError, ValueError, TypeError):
         raise AuthorizationError(
             "Unable to reconstruct the application ID from the key"
         )
 
-    app = await conn.get(App, app_id)
-
-    if app is None:
-        raise AuthorizationError(f"No app with ID {app_id}")
+    public_key, key_pair_type = await _get_verifier(app_id=app_id, conn=conn)
 
+    # Signature verification is CPU-bound; run it in a worker thread so that
+    # concurrent requests are not serialized behind it on the event loop.
     try:
-        reconstructed_payload = reconstruct_payload(
+        reconstructed_payload = await asyncio.to_thread(
+            reconstruct_payload,
             webtoken=encoded_payload,
-            public_key=app.public_key,
-            key_pair_type=app.key_pair_type,
+            public_key=public_key,
+            key_pair_type=key_pair_type,
         )
     except KeyDecodeError:
         raise AuthorizationError("Error decoding content of web token")
@@ -167,10 +276,19 @@ async def refresh_refresh_key(
 
     uuid = payload["uuid"]
 
-    if isinstance(uuid, int):
+    if isinstance(uuid, str):
         uuid = UUID(hex=uuid)
 
-    res = await conn.get(RefreshKey, uuid)
+    # Load the key together with its app and user in a single round-trip;
+    # both are needed below. The user's groups are a joined collection, so
+    # the result must be uniqued.
+    query = (
+        select(RefreshKey)
+        .options(joinedload(RefreshKey.app), joinedload(RefreshKey.user))
+        .where(RefreshKey.refresh_key_id == uuid)
+    )
+
+    res = (await conn.execute(query)).unique().scalar_one_or_none()
 
     if res is None:
         raise AuthorizationError(f"Prior key not found ({uuid})")
@@ -185,22 +303,18 @@ async def refresh_refresh_key(
 
     # We have an active key.
     new_payload = refresh_refresh_key_payload(payload)
-    app = await conn.get(App, res.app_id)
+    app = res.app
 
+    # refresh_refresh_key_payload always stamps a timezone-aware datetime;
+    # the expiry is carried over unchanged from the previous key below.
     create_time = new_payload["iat"]
-    expiry_time = new_payload["exp"]
     uuid = new_payload["uuid"]
 
-    if isinstance(create_time, int):
-        create_time = datetime.fromtimestamp(create_time)
-
-    if isinstance(expiry_time, int):
-        expiry_time = datetime.fromtimestamp(expiry_time)
-
-    content = sign_payload(
+    content = await asyncio.to_thread(
+        sign_payload,
         app_id=app.app_id,
         key_password=settings.key_password,
-        private_key=app.private_key,
+        private_key=await _get_signing_key(app=app, settings=settings),
         key_pair_type=app.key_pair_type,
         payload=new_payload,
     )
@@ -227,13 +341,11 @@ async def refresh_refresh_key(
     res.used += 1
     res.last_used = create_time
 
+    # `res` was loaded through this session and is already tracked.
     conn.add(refresh_key)
-    conn.add(res)
 
     # Check against GitHub for this user
-    try:
-        user = await user_service.read_by_id(user_id=refresh_key.user_id, conn=conn)
-    except user_service.UserNotFound:
+    if (user := res.user) is None:
         raise AuthorizationError(f"User {refresh_key.user_id} not found")
 
     user = await provider.refresh(user=user, settings=settings, conn=conn, log=log)
@@ -259,7 +371,7 @@ async def expire_refresh_key(
 
     uuid = payload["uuid"]
 
-    if isinstance(uuid, int):
+    if isinstance(uuid, str):
         uuid = UUID(hex=uuid)
 
     await expire_refresh_key_by_id(key_id=uuid, conn=conn)
@@ -269,26 +381,80 @@ async def expire_refresh_key(
 
 async def expire_refresh_key_by_id(key_id: UUID, conn: AsyncSession):
     """
-    Force-expire a refresh key based upon its id.
+    Force-expire a refresh key based upon its id. The change is not
+    committed; that is left to the caller's transaction.
     """
 
-    res = await conn.get(RefreshKey, key_id)
+    await expire_refresh_keys_by_ids(key_ids=[key_id], conn=conn)
 
-    if res is None:
-        return
+    return
 
-    if res.revoked:
-        return
 
-    res.last_used = datetime.now(timezone.utc)
-    res.revoked = True
+async def expire_refresh_keys_by_ids(key_ids: Iterable[UUID], conn: AsyncSession):
+    """
+    Force-expire a set of refresh keys based upon their ids, in a single
+    statement. As with `expire_refresh_key_by_id`, the caller must commit.
+    """
+
+    # A single conditional UPDATE: keys that do not exist or are already
+    # revoked simply match no rows, and there is no window between reading
+    # and writing a key for a concurrent revocation to slip through.
+    query = (
+        update(RefreshKey)
+        .where(RefreshKey.refresh_key_id.in_(key_ids), RefreshKey.revoked == false())
+        .values(revoked=True, last_used=datetime.now(timezone.utc))
+    )
 
-    conn.add(res)
-    await conn.commit()
+    await conn.execute(query)
 
     return
 
 
+# Shared projection for the login listings below. Select objects are
+# immutable, so the base statement is built once and each caller only
+# adds its own filter. Columns are labelled with the LoggedInUserData field
+# names so that rows can be validated in bulk.
+_LOGGED_IN_QUERY = (
+    select(
+        RefreshKey.refresh_key_id,
+        RefreshKey.app_id,
+        User.user_name,
+        RefreshKey.created_at.label("first_authenticated"),
+        RefreshKey.last_used.label("last_authenticated"),
+        RefreshKey.expires_at.label("login_expires"),
+        User.user_id,
+        RefreshKey.api_key,
+        App.app_name,
+    )
+    .join(RefreshKey.user)
+    .join(RefreshKey.app)
+)
+
+_LOGGED_IN_ADAPTER = TypeAdapter(list[LoggedInUserData])
+
+# Rows fetched from the server-side cursor per round of _stream_logged_in.
+_LOGGED_IN_PARTITION_SIZE = 500
+
+
+async def _stream_logged_in(query, conn: AsyncSession) -> list[LoggedInUserData]:
+    """
+    Run a login listing query, streaming the rows in partitions so that
+    large tables are neither buffered in one go nor unpacked without
+    yielding to the event loop. Each partition is validated in one call.
+    """
+
+    result = await conn.stream(
+        query.execution_options(yield_per=_LOGGED_IN_PARTITION_SIZE)
+    )
+
+    unpacked = []
+
+    async for partition in result.mappings().partitions():
+        unpacked.extend(_LOGGED_IN_ADAPTER.validate_python(partition))
+
+    return unpacked
+
+
 async def get_all_logins_for_user(
     user_id: UUID, conn: AsyncSession, log: FilteringBoundLogger
 ) -> list[LoggedInUserData]:
@@ -299,39 +465,11 @@ async def get_all_logins_for_user(
 
     log = log.bind(user_id=user_id)
 
-    query = (
-        select(
-            RefreshKey.refresh_key_id,
-            RefreshKey.app_id,
-            User.user_name,
-            RefreshKey.created_at,
-            RefreshKey.last_used,
-            RefreshKey.expires_at,
-            User.user_id,
-            RefreshKey.api_key,
-            App.app_name,
-        )
-        .filter(RefreshKey.user_id == user_id, RefreshKey.revoked == false())
-        .join(RefreshKey.user)
-        .join(RefreshKey.app)
+    query = _LOGGED_IN_QUERY.filter(
+        RefreshKey.user_id == user_id, RefreshKey.revoked == false()
     )
 
-    result = await conn.execute(query)
-
-    def unpack(x):
-        return LoggedInUserData(
-            refresh_key_id=x[0],
-            app_id=x[1],
-            user_name=x[2],
-            first_authenticated=x[3],
-            last_authenticated=x[4],
-            login_expires=x[5],
-            user_id=x[6],
-            api_key=x[7],
-            app_name=x[8],
-        )
-
-    unpacked = [unpack(x) for x in result]
+    unpacked = await _stream_logged_in(query=query, conn=conn)
 
     log = log.bind(number_of_logins=len(unpacked))
 
@@ -349,39 +487,11 @@ async def get_logged_in_users(
 
     log = log.bind(app_id=app_id)
 
-    query = (
-        select(
-            RefreshKey.refresh_key_id,
-            User.user_name,
-            RefreshKey.created_at,
-            RefreshKey.last_used,
-            RefreshKey.expires_at,
-            RefreshKey.app_id,
-            User.user_id,
-            RefreshKey.api_key,
-            App.app_name,
-        )
-        .filter(RefreshKey.app_id == app_id, RefreshKey.revoked == false())
-        .join(RefreshKey.user)
-        .join(RefreshKey.app)
+    query = _LOGGED_IN_QUERY.filter(
+        RefreshKey.app_id == app_id, RefreshKey.revoked == false()
     )
 
-    result = await conn.execute(query)
-
-    def unpack(x):
-        return LoggedInUserData(
-            refresh_key_id=x[0],
-            user_name=x[1],
-            first_authenticated=x[2],
-            last_authenticated=x[3],
-            login_expires=x[4],
-            app_id=x[5],
-            user_id=x[6],
-            api_key=x[7],
-            app_name=x[8],
-        )
-
-    unpacked = [unpack(x) for x in result]
+    unpacked = await _stream_logged_in(query=query, conn=conn)
 
     log = log.bind(number_of_users=len(unpacked))
 
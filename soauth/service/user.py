@@ -4,14 +4,17 @@ Service layer for users
 
 from datetime import datetime, timezone
 
-from sqlalchemy import select
+from sqlalchemy import delete as sql_delete
+from sqlalchemy import or_, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from structlog.typing import FilteringBoundLogger
 
+from soauth.core.names import normalize_name
 from soauth.core.user import UserData
 from soauth.core.uuid import UUID
-from soauth.database.group import Group
+from soauth.database.app import App
+from soauth.database.group import Group, GroupMembership
 from soauth.database.user import User
 
 
@@ -36,7 +39,7 @@ async def create(
     Creates a user, if they do not exist.
     """
 
-    user_name = user_name.strip().lower().replace(" ", "_")
+    user_name = normalize_name(user_name)
 
     log = log.bind(user_name=user_name, email=email, grants=grants)
 
@@ -62,8 +65,10 @@ async def create(
         members=[user],
     )
 
-    user.groups = [group]
-
+    # Primary keys are generated client-side (uuid7), so the user, the group,
+    # and the membership row (populated on user.groups through the
+    # back_populates on Group.members) are all inserted in one flush
+    # without reading anything back.
     conn.add_all([user, group])
 
     log = log.bind(user_id=user.user_id, group_id=group.group_id)
@@ -82,7 +87,7 @@ async def read_by_id(user_id: UUID, conn: AsyncSession) -> User:
 
 
 async def read_by_name(user_name: str, conn: AsyncSession) -> User:
-    user_name = user_name.strip().lower().replace(" ", "_")
+    user_name = normalize_name(user_name)
 
     query = select(User).filter(User.user_name == user_name)
     res = (await conn.execute(query)).unique().scalar_one_or_none()
@@ -105,14 +110,13 @@ async def get_user_list(conn: AsyncSession) -> list[UserData]:
 async def add_grant(
     user_name: str, grant: str, conn: AsyncSession, log: FilteringBoundLogger
 ) -> User:
-    user_name = user_name.strip().lower().replace(" ", "_")
+    user_name = normalize_name(user_name)
 
     log = log.bind(user_name=user_name, grant=grant)
     user = await read_by_name(user_name=user_name, conn=conn)
     log = log.bind(user_id=user.user_id)
 
     user.add_grant(grant=grant)
-    conn.add(user)
 
     await log.ainfo("user.grant_added")
 
@@ -122,14 +126,13 @@ async def add_grant(
 async def remove_grant(
     user_name: str, grant: str, conn: AsyncSession, log: FilteringBoundLogger
 ) -> User:
-    user_name = user_name.strip().lower().replace(" ", "_")
+    user_name = normalize_name(user_name)
 
     log = log.bind(user_name=user_name, grant=grant)
     user = await read_by_name(user_name=user_name, conn=conn)
     log = log.bind(user_id=user.user_id)
 
     user.remove_grant(grant=grant)
-    conn.add(user)
 
     await log.ainfo("user.grant_removed")
 
@@ -140,27 +143,44 @@ async def delete(user_name: str, conn: AsyncSession, log: FilteringBoundLogger):
     """
     Deletes both the 'User' and 'Group' model.
     """
-    user_name = user_name.strip().lower().replace(" ", "_")
+    user_name = normalize_name(user_name)
+
+    # Issued as bulk statements rather than loading and deleting the ORM
+    # objects. Refresh keys are removed by their ON DELETE CASCADE foreign
+    # key. Group memberships are deleted explicitly, as the ORM would do
+    # through the relationships, because sqlite does not enforce foreign keys
+    # (and so never cascades) unless asked to. The personal group must go
+    # before the user as it references them, and apps are detached from the
+    # user just as the ORM would do when deleting it.
+    user_id_query = select(User.user_id).where(User.user_name == user_name)
+    group_id_query = select(Group.group_id).where(Group.group_name == user_name)
+
+    await conn.execute(
+        sql_delete(GroupMembership).where(
+            or_(
+                GroupMembership.user_id.in_(user_id_query),
+                GroupMembership.group_id.in_(group_id_query),
+            )
+        )
+    )
 
-    user = await read_by_name(user_name=user_name, conn=conn)
-    group = (
-        (await conn.execute(select(Group).filter(Group.group_name == user_name)))
-        .unique()
-        .scalar_one_or_none()
+    group_id = await conn.scalar(
+        sql_delete(Group).where(Group.group_name == user_name).returning(Group.group_id)
     )
 
-    log = log.bind(user_id=user.user_id)
+    await conn.execute(
+        update(App)
+        .where(App.created_by_user_id.in_(user_id_query))
+        .values(created_by_user_id=None)
+    )
 
-    if group is not None:
-        log = log.bind(group_id=group.group_id)
-    else:
-        log = log.bind(group_id=None)
+    user_id = await conn.scalar(
+        sql_delete(User).where(User.user_name == user_name).returning(User.user_id)
+    )
 
-    with conn.no_autoflush:
-        await conn.delete(user)
-        if group is not None:
-            await conn.delete(group)
+    if user_id is None:
+        raise UserNotFound(f"User with name {user_name} not found in the database")
 
-    await log.ainfo("user.deleted")
+    await log.ainfo("user.deleted", user_id=user_id, group_id=group_id)
 
     return
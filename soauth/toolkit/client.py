@@ -3,8 +3,10 @@ An API client for SOAuth, wraps around httpx.
 """
 
 import asyncio
+import os
 import threading
-from datetime import datetime, timedelta, timezone
+import time
+from datetime import datetime, timedelta
 from hashlib import md5
 from pathlib import Path
 from typing import Any
@@ -13,6 +15,13 @@ import httpx
 from httpx._types import QueryParamTypes, RequestContent, RequestData, RequestFiles
 from pydantic import BaseModel
 
+from soauth.toolkit.http import HTTP_LIMITS, get_http_client
+
+_IDENTITY_SERVER = "https://ingress.simonsobs-identity.production.svc.spin.nersc.org"
+_SERIALIZATION_DIRECTORY = Path.home() / ".config/soauth"
+# Access tokens are exchanged for fresh ones this long before they expire.
+_REFRESH_MARGIN = timedelta(minutes=5)
+
 
 class TokenData(BaseModel):
     access_token: str | None = None
@@ -21,6 +30,45 @@ class TokenData(BaseModel):
     refresh_token_expires: datetime | None = None
 
 
+def _parse_token(data: str | bytes) -> TokenData:
+    """
+    Parse token data from the identity server or a token file. Raw bytes
+    are handed straight to pydantic's JSON parser, with no intermediate
+    decode to a string.
+    """
+    return TokenData.model_validate_json(data)
+
+
+def _write_private(path: Path, data: bytes):
+    """
+    Write `data` to `path`, leaving the file readable only by its owner. New
+    files are created with that mode; an existing file is only chmod-ed if
+    its mode is wrong, and before the data is written.
+    """
+    with open(
+        path, "wb", opener=lambda p, flags: os.open(p, flags, mode=0o600)
+    ) as handle:
+        if os.fstat(handle.fileno()).st_mode & 0o777 != 0o600:
+            os.chmod(path, 0o600)
+
+        handle.write(data)
+
+
+def _refresh_deadline(token_data: TokenData) -> float:
+    """
+    The POSIX timestamp after which the access token in `token_data` should
+    be exchanged for a fresh one. Zero if there is no usable access token.
+
+    This is compared against `time.time()` rather than the monotonic clock,
+    which stops while the machine is suspended and so would keep an expired
+    token looking fresh after a laptop wakes up.
+    """
+    if token_data.access_token is None or token_data.access_token_expires is None:
+        return 0.0
+
+    return (token_data.access_token_expires - _REFRESH_MARGIN).timestamp()
+
+
 class SOAuth(httpx.Auth):
     """
     An authentication provider for httpx, providing threadsafe authentication access.
@@ -30,6 +78,13 @@ class SOAuth(httpx.Auth):
     serialization_directory: Path
     identity_server: str
     token_tag: str
+    filename: Path
+
+    # Connection pool for asynchronous identity server exchanges, created on
+    # first use. Unlike the shared synchronous pool (`get_http_client`), it is
+    # bound to the event loop it was created in, so it lives on the instance
+    # alongside the asyncio lock (see `aclose`).
+    _async_client: httpx.AsyncClient | None = None
 
     def __init__(
         self,
@@ -98,54 +153,79 @@ class SOAuth(httpx.Auth):
         ```
         Which will de-serialize the keys from the appropriate file.
         """
+        self._refresh_after = 0.0
+
         if api_key is not None:
-            self.token_data = TokenData(refresh_token=api_key)
+            self._set_token_data(TokenData(refresh_token=api_key))
 
         if serialization_directory is None:
-            serialization_directory = Path.home() / ".config/soauth"
+            serialization_directory = _SERIALIZATION_DIRECTORY
 
         if identity_server is None:
-            identity_server = (
-                "https://ingress.simonsobs-identity.production.svc.spin.nersc.org"
-            )
+            identity_server = _IDENTITY_SERVER
 
         self.identity_server = identity_server
         self.serialization_directory = serialization_directory
         self.token_tag = token_tag
 
+        self.serialization_directory.mkdir(exist_ok=True, parents=True)
+        self.filename = self.serialization_directory / self.token_tag
+
         self._sync_lock = threading.RLock()
         self._async_lock = asyncio.Lock()
 
+    def _set_token_data(self, token_data: TokenData):
+        """
+        Store new token data, and work out (as a wall-clock timestamp) when
+        the access token will next need to be exchanged, so that checking it
+        on each request is a single comparison against `time.time()`.
+        """
+
+        # Invalidate the deadline before swapping the token data, so that the
+        # lock-free read in the get_token methods never pairs a stale
+        # deadline with new data.
+        self._refresh_after = 0.0
+        self.token_data = token_data
+        # The header only changes with the token, so it is built here rather
+        # than on every request.
+        self._authorization = f"Bearer {token_data.access_token}"
+        self._refresh_after = _refresh_deadline(token_data)
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(limits=HTTP_LIMITS)
+
+        return self._async_client
+
+    async def aclose(self):
+        """
+        Close the connection pool used for asynchronous token exchanges.
+        """
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
     def sync_exchange_with_identity_server(self, refresh_token: str):
         url = f"{self.identity_server}/exchange"
 
-        response = httpx.post(url, json={"refresh_token": refresh_token})
+        response = get_http_client().post(url, json={"refresh_token": refresh_token})
 
         if response.status_code != 200:
             raise ValueError(
                 f"Failed to exchange token: {response.status_code} {response.text}"
             )
 
-        self.token_data = TokenData.model_validate_json(response.content)
+        self._set_token_data(_parse_token(response.content))
         self.serialize_tokens(token_data=self.token_data)
 
         return
 
-    @property
-    def filename(self):
-        if not self.serialization_directory.exists():
-            self.serialization_directory.mkdir(exist_ok=True, parents=True)
-        return self.serialization_directory / self.token_tag
-
     def serialize_tokens(self, token_data: TokenData) -> Path:
         """
         Serializes the access tokens to disk.
         """
 
-        with open(self.filename, "w") as handle:
-            handle.write(token_data.model_dump_json())
-
-        self.filename.chmod(0o600)
+        _write_private(self.filename, token_data.model_dump_json().encode("utf-8"))
 
         return self.filename
 
@@ -154,19 +234,23 @@ class SOAuth(httpx.Auth):
         Reads the token data from file but does not do any code exchange.
         """
 
-        with open(self.filename, "r") as handle:
-            self.token_data = TokenData.model_validate_json(handle.read())
+        self._set_token_data(_parse_token(self.filename.read_bytes()))
 
         return self.token_data
 
     def sync_get_token(self):
+        # Fast path: a token that is still fresh can be returned without
+        # taking the lock. The deadline is only ever set after the token data
+        # it describes, so a deadline that has not passed always belongs to
+        # a valid token.
+        if time.time() < self._refresh_after:
+            return self.token_data.access_token
+
         with self._sync_lock:
             if self.token_data is None:
                 self.deserialize_tokens()
 
-            if self.token_data.access_token is None or (
-                self.token_data.access_token_expires - datetime.now(tz=timezone.utc)
-            ) < timedelta(minutes=5):
+            if time.time() >= self._refresh_after:
                 self.sync_exchange_with_identity_server(
                     refresh_token=self.token_data.refresh_token
                 )
@@ -174,35 +258,38 @@ class SOAuth(httpx.Auth):
             return self.token_data.access_token
 
     def sync_auth_flow(self, request):
-        token = self.sync_get_token()
-        request.headers["Authorization"] = f"Bearer {token}"
+        self.sync_get_token()
+        request.headers["Authorization"] = self._authorization
         yield request
 
     async def async_exchange_with_identity_server(self, refresh_token: str):
         url = f"{self.identity_server}/exchange"
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json={"refresh_token": refresh_token})
 
-            if response.status_code != 200:
-                raise ValueError(
-                    f"Failed to exchange token: {response.status_code} {response.text}"
-                )
+        response = await self._get_async_client().post(
+            url, json={"refresh_token": refresh_token}
+        )
+
+        if response.status_code != 200:
+            raise ValueError(
+                f"Failed to exchange token: {response.status_code} {response.text}"
+            )
 
-        self.token_data = TokenData.model_validate_json(response.content)
+        self._set_token_data(_parse_token(response.content))
         self.serialize_tokens(token_data=self.token_data)
 
         return
 
     async def async_get_token(self):
+        # See sync_get_token for the lock-free fast path.
+        if time.time() < self._refresh_after:
+            return self.token_data.access_token
+
         async with self._async_lock:
             if self.token_data is None:
                 # This must mean that we need to deserialize
-                with open(self.filename, "r") as handle:
-                    self.token_data = TokenData.Model_validate_json(handle.read())
+                self.deserialize_tokens()
 
-            if self.token_data.access_token is None or (
-                self.token_data.access_token_expires - datetime.now(tz=timezone.utc)
-            ) < timedelta(minutes=5):
+            if time.time() >= self._refresh_after:
                 await self.async_exchange_with_identity_server(
                     refresh_token=self.token_data.refresh_token
                 )
@@ -210,8 +297,8 @@ class SOAuth(httpx.Auth):
             return self.token_data.access_token
 
     async def async_auth_flow(self, request):
-        token = await self.async_get_token()
-        request.headers["Authorization"] = f"Bearer {token}"
+        await self.async_get_token()
+        request.headers["Authorization"] = self._authorization
         yield request
 
 
@@ -221,7 +308,14 @@ class SOAuthClient:
     `threading` or `multiprocessing` is not supported.
     """
 
-    def __init__(self, base_url: str, api_key: str | None = None):
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str | None = None,
+        *,
+        serialization_directory: Path | None = None,
+        identity_server: str | None = None,
+    ):
         """
         Create a (non-threadsafe) SO Auth client. Do not use this even from
         multiple scripts at once!
@@ -238,9 +332,29 @@ class SOAuthClient:
             The 'new' API key to use. If this is None, we assume that you
             have serialized the API key at ~/.config/soauth/$HASH where $HASH
             is the hash of the base_url.
+
+        serialization_directory: Path | None, optional
+            The serialization directory for keys. If not provided, we use `~/.config/soauth`.
+
+        identity_server: str | None, optional
+            Which identity server to use, if not provided we use the default.
         """
 
+        if serialization_directory is None:
+            serialization_directory = _SERIALIZATION_DIRECTORY
+
+        if identity_server is None:
+            identity_server = _IDENTITY_SERVER
+
+        self.serialization_directory = serialization_directory
+        self.identity_server = identity_server
+        self._exchange_url = f"{identity_server}/exchange"
+
         self.base_url, self.base_url_hash = self._validate_base_url(base_url=base_url)
+        self.serialization_directory.mkdir(parents=True, exist_ok=True)
+        self._token_file = self.serialization_directory / self.base_url_hash
+        self._last_serialized: bytes | None = None
+        self._refresh_after = 0.0
         self._initial_client_creation(api_key=api_key)
         return
 
@@ -280,52 +394,60 @@ class SOAuthClient:
         and serializes it to the key file. If `self._client` is set, updates the cookies.
         """
 
-        global _IDENTITY_SERVER
-
-        url = f"{_IDENTITY_SERVER}/exchange"
-
-        response = httpx.post(url, json={"refresh_token": refresh_token})
+        response = get_http_client().post(
+            self._exchange_url, json={"refresh_token": refresh_token}
+        )
 
         if response.status_code != 200:
             raise ValueError(
                 f"Failed to exchange token: {response.status_code} {response.text}"
             )
 
-        self.token_data = TokenData.model_validate_json(response.content)
+        self._set_token_data(_parse_token(response.content))
         self._serialize_tokens(token_data=self.token_data)
         self._create_client(token_data=self.token_data)
 
         return
 
+    def _set_token_data(self, token_data: TokenData):
+        """
+        Store new token data along with the time at which the access token
+        will need to be exchanged.
+        """
+
+        self.token_data = token_data
+        self._refresh_after = _refresh_deadline(token_data)
+
     def _filename(self) -> Path:
-        global _SERIALIZATION_DIRECTORY
-        _SERIALIZATION_DIRECTORY.mkdir(parents=True, exist_ok=True)
-        filename = _SERIALIZATION_DIRECTORY / self.base_url_hash
-        return filename
+        return self._token_file
 
     def _deserialize_tokens(self) -> TokenData:
         """
         Reads the token data from file but does not do any code exchange.
         """
 
-        filename = self._filename()
-
-        with open(filename, "r") as handle:
-            self.token_data = TokenData.model_validate_json(handle.read())
+        self._set_token_data(_parse_token(self._filename().read_bytes()))
 
         return self.token_data
 
     def _serialize_tokens(self, token_data: TokenData) -> Path:
         """
-        Serializes the access tokens to disk.
+        Serializes the access tokens to disk. Nothing is written if the content
+        is unchanged since the last write; otherwise the file is replaced
+        atomically so that an interrupted write cannot leave it truncated.
         """
 
         filename = self._filename()
+        serialized = token_data.model_dump_json().encode("utf-8")
+
+        if serialized == self._last_serialized:
+            return filename
 
-        with open(filename, "w") as handle:
-            handle.write(token_data.model_dump_json())
+        temporary = filename.with_suffix(".tmp")
+        _write_private(temporary, serialized)
+        os.replace(temporary, filename)
 
-        filename.chmod(0o600)
+        self._last_serialized = serialized
 
         return filename
 
@@ -335,9 +457,7 @@ class SOAuthClient:
         the code exchange.
         """
 
-        if (
-            self.token_data.access_token_expires - datetime.now(tz=timezone.utc)
-        ) < timedelta(minutes=5):
+        if time.time() >= self._refresh_after:
             # TODO: handle expiry of stuff!
             self._exchange_with_identity_server(
                 refresh_token=self.token_data.refresh_token
@@ -9,10 +9,13 @@ to
 from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from structlog import get_logger
 
 from soauth.core.uuid import UUID
 from soauth.toolkit.fastapi import global_setup
 
+logger = get_logger()
+
 
 class ConsumerSettings(BaseSettings):
     app_base_url: str
@@ -46,19 +49,25 @@ app = global_setup(
 def login(request: Request):
     if request.user.is_authenticated:
         return HTMLResponse(
-            content=f"<html><body><a href='{app.logout_url}'>Logout</a>"
+            content=f"<html><body><a href='{app.auth_urls.logout}'>Logout</a>"
         )
     else:
-        return HTMLResponse(content=f"<html><body><a href='{app.login_url}'>Login</a>")
+        return HTMLResponse(
+            content=f"<html><body><a href='{app.auth_urls.login}'>Login</a>"
+        )
 
 
 @app.post("/introspect")
 def introspect(request: Request):
     if not request.user.is_authenticated:
-        print("Not authenticated")
+        logger.debug("tk.consumer.introspect.unauthenticated")
         raise HTTPException(401, "Not authenticated")
 
     if settings.required_grant not in request.auth.scopes:
-        print(settings.required_grant, "not in", request.auth.scopes)
+        logger.debug(
+            "tk.consumer.introspect.missing_grant",
+            grant=settings.required_grant,
+            scopes=request.auth.scopes,
+        )
         raise HTTPException(401, "Not authorized")
     return Response()
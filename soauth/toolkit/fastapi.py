@@ -16,6 +16,11 @@ lest you return a bunch of 500s when access tokens are invalid.
 
 If you are looking for a one-stop-shop, check out `global_setup`.
 
+Authentication events are logged at debug level through `structlog`. In
+production, configure it with a filtering logger (e.g.
+`structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
+cache_logger_on_first_use=True)`) so that these cost next to nothing.
+
 To use the dependency:
 
 ```
@@ -33,15 +38,20 @@ async def secure_endpoint(user: AuthenticatedUserDependency):
 ```
 """
 
-from typing import Annotated
+from typing import Annotated, NamedTuple
 
 from fastapi import Depends, FastAPI, HTTPException, Request, status
-from pydantic import Field
+from pydantic import ConfigDict, Field
 from starlette.middleware.authentication import AuthenticationMiddleware
 from structlog import get_logger
 
-from soauth.core.auth import KeyDecodeError, decode_access_token
+from soauth.core.auth import (
+    KeyDecodeError,
+    async_decode_access_token,
+    load_public_key,
+)
 from soauth.core.tokens import KeyExpiredError
+from soauth.core.user import UserData
 from soauth.core.uuid import UUID
 
 from .starlette import (
@@ -56,9 +66,37 @@ from .starlette import (
     transform_auth_error,
 )
 
+logger = get_logger()
+
 
 class SOUserWithGrants(SOUser):
-    grants: set[str] = Field(default_factory=set)
+    grants: frozenset[str] = Field(default_factory=frozenset)
+
+
+class _AnonymousSOUserWithGrants(SOUserWithGrants):
+    """
+    The user for requests without any credentials. Frozen, so that a single
+    instance can be shared between all such requests.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+
+ANONYMOUS_USER_WITH_GRANTS = _AnonymousSOUserWithGrants()
+
+
+class AuthUrls(NamedTuple):
+    """
+    The URLs derived by `global_setup` for an application, available as
+    `app.auth_urls`.
+    """
+
+    base: str
+    login: str
+    code: str
+    refresh: str
+    expire: str
+    logout: str
 
 
 def add_exception_handlers(app: FastAPI, allow_refresh: bool = True) -> FastAPI:
@@ -84,6 +122,51 @@ def add_exception_handlers(app: FastAPI, allow_refresh: bool = True) -> FastAPI:
     return app
 
 
+async def _decode_request_token(request: Request) -> UserData | None:
+    """
+    Find and decode the access token for a request, returning None if the
+    request carries no token at all.
+    """
+
+    app = request.app
+
+    # Two possibilities: either we have the access token as a cookie, or we
+    # have it as a 'Bearer' token in the headers. The header is checked first
+    # so that we never parse the cookies for bearer-authenticated requests.
+
+    if (authorization := request.headers.get("authorization")) is not None:
+        # Auth scheme is case-insensitive (RFC 9110 11.1)
+        if authorization[:7].lower() != "bearer ":
+            raise KeyDecodeError("Authorization header is not a Bearer token")
+        access_token = authorization[7:]
+    elif (
+        access_token := request.cookies.get(
+            getattr(app, "access_token_name", "access_token")
+        )
+    ) is None:
+        logger.debug("tk.fastapi.auth.no_token", client=request.client)
+        return None
+
+    if not access_token:
+        logger.debug("tk.fastapi.auth.no_token", client=request.client)
+        raise KeyDecodeError("Invalid value for access token")
+
+    try:
+        user_data = await async_decode_access_token(
+            encrypted_access_token=access_token,
+            public_key=app.public_key,
+            key_pair_type=app.key_pair_type,
+        )
+    except KeyDecodeError as e:
+        logger.debug("tk.fastapi.auth.no_decode", client=request.client)
+        raise e
+    except KeyExpiredError as e:
+        logger.debug("tk.fastapi.auth.expired", client=request.client)
+        raise e
+
+    return user_data
+
+
 async def handle_user(request: Request) -> SOUserWithGrants:
     """
     Handler for user authentication. To handles the cases where we
@@ -101,61 +184,54 @@ async def handle_user(request: Request) -> SOUserWithGrants:
     - `request.app.key_pair_type` to the public key type for your application.
     """
 
-    refresh_token_name = getattr(request.app, "refresh_token_name", "refresh_token")
-    access_token_name = getattr(request.app, "access_token_name", "access_token")
-
-    log = get_logger()
-
-    log = log.bind(
-        client=request.client,
-        refresh_token_name=refresh_token_name,
-        access_token_name=access_token_name,
-    )
-
-    # Two possibilities: either we have the access token as a cookie, or we
-    # have it as a 'Bearer' token in the headers.
-
-    if "Authorization" in request.headers:
-        contents = request.headers["Authorization"].split(" ")
-        if contents[0] != "Bearer":
-            raise KeyDecodeError
-        access_token = contents[1]
-    elif access_token_name in request.cookies:
-        access_token = request.cookies[access_token_name]
-    else:
-        log.debug("tk.fastapi.auth.no_token")
-        return SOUserWithGrants(is_authenticated=False)
-
-    if access_token is None:
-        log.debug("tk.fastapi.auth.no_token")
-        raise KeyDecodeError("Invalid value for access token")
+    # When the middleware is installed it has already decoded this request's
+    # token, so there is no need to do it again.
+    if (user_data := getattr(request.state, "soauth_user_data", None)) is None:
+        user_data = await _decode_request_token(request=request)
 
-    try:
-        user_data = decode_access_token(
-            encrypted_access_token=access_token,
-            public_key=request.app.public_key,
-            key_pair_type=request.app.key_pair_type,
-        )
-    except KeyDecodeError as e:
-        log.debug("tk.fastapi.auth.no_decode")
-        raise e
-    except KeyExpiredError as e:
-        log.debug("tk.fastapi.auth.expired")
-        raise e
+        if user_data is None:
+            return ANONYMOUS_USER_WITH_GRANTS
 
-    user = SOUserWithGrants(
+    # user_data has already been validated by decode_access_token, so we only
+    # need to fill in the containers that are optional there. These are
+    # frozen, as user_data is shared between requests through the decode
+    # cache and must not be mutated.
+    user = SOUserWithGrants.model_construct(
         is_authenticated=True,
         display_name=user_data.user_name,
         user_id=user_data.user_id,
         full_name=user_data.full_name,
         email=user_data.email,
-        groups=user_data.group_names,
-        grants=user_data.grants,
+        groups=frozenset(user_data.group_names or ()),
+        grants=frozenset(user_data.grants or ()),
     )
 
-    log = log.bind(**user.model_dump())
+    logger.debug(
+        "tk.fastapi.auth.success",
+        client=request.client,
+        user_id=user.user_id,
+        display_name=user.display_name,
+    )
+
+    return user
+
+
+async def require_authenticated_user(
+    user: Annotated[SOUserWithGrants, Depends(handle_user)],
+) -> SOUserWithGrants:
+    """
+    The same as `handle_user` but raises a 401 if the user is not
+    authenticated. Check `handle_user` for requirements. This is the
+    dependency behind `AuthenticatedUserDependency`.
 
-    log.debug("tk.fastapi.auth.success")
+    The user is taken as a sub-dependency so that FastAPI's per-request
+    dependency cache shares a single `handle_user` call between this and
+    any other dependency on the same request.
+    """
+    if not user.is_authenticated:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Log in first"
+        )
 
     return user
 
@@ -164,6 +240,10 @@ async def handle_authenticated_user(request: Request) -> SOUserWithGrants:
     """
     The same as `handle_user` but raises a 401 if the user is not
     authenticated. Check `handle_user` for requirements.
+
+    Kept for code that calls it directly with a request; as a dependency,
+    prefer `require_authenticated_user` (or `AuthenticatedUserDependency`),
+    which shares the `handle_user` call with other dependencies.
     """
     user = await handle_user(request=request)
 
@@ -289,16 +369,29 @@ def global_setup(
     app.client_secret = client_secret
     app.app_id = app_id
     app.use_refresh_token = use_refresh_token
+    app.access_token_name = getattr(app, "access_token_name", "access_token")
+    app.refresh_token_name = getattr(app, "refresh_token_name", "refresh_token")
 
     app.public_key = public_key.encode("utf-8")
     app.key_pair_type = key_pair_type
-
-    # Derived URLs (set as defaults based on bundled OAuth provider).
-    app.login_url = f"{authentication_base_url}/login/{app_id}"
-    app.code_url = f"{authentication_base_url}/code/{app_id}"
-    app.refresh_url = f"{authentication_base_url}/exchange"
-    app.expire_url = f"{authentication_base_url}/expire"
-    app.logout_url = f"{app_base_url}/logout"
+    load_public_key(app.public_key)
+
+    # Derived URLs (set as defaults based on bundled OAuth provider). These
+    # are also kept as individual attributes, which is what the handlers
+    # (and apps that are configured by hand) use.
+    app.auth_urls = AuthUrls(
+        base=app_base_url,
+        login=f"{authentication_base_url}/login/{app_id}",
+        code=f"{authentication_base_url}/code/{app_id}",
+        refresh=f"{authentication_base_url}/exchange",
+        expire=f"{authentication_base_url}/expire",
+        logout=f"{app_base_url}/logout",
+    )
+    app.login_url = app.auth_urls.login
+    app.code_url = app.auth_urls.code
+    app.refresh_url = app.auth_urls.refresh
+    app.expire_url = app.auth_urls.expire
+    app.logout_url = app.auth_urls.logout
 
     if add_middleware:
         app.add_middleware(
@@ -306,6 +399,8 @@ def global_setup(
             backend=SOAuthCookieBackend(
                 public_key=app.public_key,
                 key_pair_type=app.key_pair_type,
+                access_token_name=app.access_token_name,
+                refresh_token_name=app.refresh_token_name,
                 use_refresh_token=use_refresh_token,
             ),
             on_error=on_auth_error if handle_exceptions else transform_auth_error,
@@ -347,5 +442,5 @@ def mock_global_setup(
 
 UserDependency = Annotated[SOUserWithGrants, Depends(handle_user)]
 AuthenticatedUserDependency = Annotated[
-    SOUserWithGrants, Depends(handle_authenticated_user)
+    SOUserWithGrants, Depends(require_authenticated_user)
 ]
@@ -0,0 +1,32 @@
+"""
+Shared connection pools for the toolkit's calls to the identity server.
+"""
+
+import atexit
+import threading
+
+import httpx
+
+# Token exchanges are infrequent, so idle connections are kept for longer
+# than httpx's default to save a new TCP and TLS handshake on the next one.
+# Used by every client the toolkit creates, synchronous or asynchronous.
+HTTP_LIMITS = httpx.Limits(keepalive_expiry=300)
+
+_http_client: httpx.Client | None = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Get the synchronous client shared by the whole process, creating it on
+    first use. It is closed at exit.
+    """
+    global _http_client
+
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(limits=HTTP_LIMITS)
+                atexit.register(_http_client.close)
+
+    return _http_client
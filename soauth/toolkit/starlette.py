@@ -36,25 +36,95 @@ There is a global setup function that can be used defined in the `fastapi.py`
 file, for FastAPI services.
 """
 
+import asyncio
+import hashlib
 import json
+import threading
+import weakref
+from contextlib import AbstractContextManager, nullcontext
+from email.utils import format_datetime
 
 import httpx
-from pydantic import BaseModel, Field
+from cachetools import TTLCache
+from pydantic import BaseModel, ConfigDict, Field
 from starlette import status
 from starlette.authentication import (
     AuthCredentials,
     AuthenticationBackend,
     AuthenticationError,
 )
+from starlette.datastructures import URL
 from starlette.exceptions import HTTPException
 from starlette.requests import Request
 from starlette.responses import RedirectResponse, Response
 from structlog import get_logger
 
-from soauth.core.auth import KeyDecodeError, decode_access_token
+from soauth.core.auth import (
+    KeyDecodeError,
+    async_decode_access_token,
+    load_public_key,
+)
 from soauth.core.models import KeyRefreshResponse
 from soauth.core.tokens import KeyExpiredError
 from soauth.core.uuid import UUID
+from soauth.toolkit.http import HTTP_LIMITS, get_http_client
+
+logger = get_logger()
+
+# Connection pools for asynchronous calls to the authentication service,
+# created on first use so that code exchanges and logouts reuse kept-alive
+# connections rather than paying for a new TCP and TLS handshake each time.
+# Async clients cannot be shared between event loops, so there is one per
+# loop; synchronous refreshes use the toolkit's shared `get_http_client`.
+_async_http_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, httpx.AsyncClient
+] = weakref.WeakKeyDictionary()
+
+
+def _get_async_http_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+
+    if (client := _async_http_clients.get(loop)) is None:
+        client = httpx.AsyncClient(limits=HTTP_LIMITS)
+        _async_http_clients[loop] = client
+
+    return client
+
+
+# Refresh results, keyed by a digest of the refresh token that was exchanged,
+# so that requests holding the same (now spent) refresh token that raced the
+# exchange all receive the new tokens. The striped locks ensure only one
+# exchange per refresh token is in flight at once across threads.
+#
+# Keeping a result after its exchange has finished is a deliberate grace
+# period: until it expires, the spent refresh token is honoured locally
+# without asking the server, and so without its revocation check. It only
+# needs to cover requests that were already in flight (a page and its
+# assets), so it is kept to a few seconds.
+_REFRESH_GRACE_SECONDS = 5
+_REFRESHED: TTLCache[bytes, KeyRefreshResponse] = TTLCache(
+    maxsize=1024, ttl=_REFRESH_GRACE_SECONDS
+)
+_REFRESHED_LOCK = threading.Lock()
+_REFRESH_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def _refresh_lock(digest: bytes) -> AbstractContextManager:
+    """
+    The lock serialising exchanges of the refresh token with this digest.
+
+    `AuthenticationMiddleware` calls its `on_error` handler synchronously on
+    the event loop thread, where requests are already handled one at a time
+    and waiting on a lock held by a worker thread would stall the whole loop.
+    There, no lock is taken and concurrent requests rely on the grace period
+    alone.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return _REFRESH_LOCKS[digest[0] % len(_REFRESH_LOCKS)]
+
+    return nullcontext()
 
 
 class AuthenticationDecodeError(AuthenticationError):
@@ -75,7 +145,23 @@ class SOUser(BaseModel):
     user_id: UUID | None = None
     full_name: str | None = None
     email: str | None = None
-    groups: set[str] = Field(default_factory=set)
+    groups: frozenset[str] = Field(default_factory=frozenset)
+
+
+class _AnonymousSOUser(SOUser):
+    """
+    The user for requests without any credentials. Frozen, so that a single
+    instance can be shared between all such requests.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+
+ANONYMOUS_USER = _AnonymousSOUser()
+# Shared between all anonymous requests, so the scopes are made immutable:
+# anything appended to them would otherwise leak into every later request.
+ANONYMOUS_CREDENTIALS = AuthCredentials()
+ANONYMOUS_CREDENTIALS.scopes = ()
 
 
 class SOAuthCookieBackend(AuthenticationBackend):
@@ -114,75 +200,79 @@ class SOAuthCookieBackend(AuthenticationBackend):
     ):
         self.public_key = public_key
         self.key_pair_type = key_pair_type
+
+        # Parse the key now so that a bad key fails at startup, and the first
+        # request does not pay for it.
+        load_public_key(public_key)
         self.access_token_name = access_token_name
         self.refresh_token_name = refresh_token_name
         self.use_refresh_token = use_refresh_token
 
     async def authenticate(self, conn: Request):
-        log = get_logger()
-
-        log = log.bind(
-            client=conn.client,
-            access_token_name=self.access_token_name,
-            refresh_token_name=self.refresh_token_name,
-            use_refresh_token=self.use_refresh_token,
-        )
-
         # Two possibilities: either we have the access token as a cookie, or we
         # have it as a 'Bearer' token in the headers.
 
-        if "Authorization" in conn.headers:
-            contents = conn.headers["Authorization"].split(" ")
-            if contents[0] != "Bearer":
-                log.debug("tk.starlette.auth.bearer_not_found")
+        if (authorization := conn.headers.get("authorization")) is not None:
+            # Auth scheme is case-insensitive (RFC 9110 11.1)
+            if authorization[:7].lower() != "bearer ":
+                logger.debug("tk.starlette.auth.bearer_not_found", client=conn.client)
                 raise AuthenticationDecodeError("Bearer token invalid")
-            log.debug("tk.starlette.auth.bearer")
-            access_token = contents[1]
-        elif self.access_token_name in conn.cookies:
-            log.debug("tk.starlette.auth.access_token_in_cookies")
-            access_token = conn.cookies[self.access_token_name]
+            logger.debug("tk.starlette.auth.bearer", client=conn.client)
+            access_token = authorization[7:]
+        elif (
+            access_token := (cookies := conn.cookies).get(self.access_token_name)
+        ) is not None:
+            # An empty cookie is still a (broken) token, and goes on to fail
+            # to decode rather than being treated as anonymous.
+            logger.debug(
+                "tk.starlette.auth.access_token_in_cookies", client=conn.client
+            )
         else:
-            if self.refresh_token_name in conn.cookies and self.use_refresh_token:
-                log.debug("tk.starlette.auth.only_refresh_cookie")
+            if self.use_refresh_token and self.refresh_token_name in cookies:
+                logger.debug(
+                    "tk.starlette.auth.only_refresh_cookie", client=conn.client
+                )
                 raise AuthenticationExpiredError("Token expired")
 
-            log.debug("tk.starlette.auth.no_cookies")
-            return AuthCredentials([]), SOUser(
-                is_authenticated=False, display_name=None
-            )
-
-        if access_token is None:
-            log.debug("tk.starlette.auth.no_token")
-            raise AuthenticationExpiredError
+            logger.debug("tk.starlette.auth.no_cookies", client=conn.client)
+            return ANONYMOUS_CREDENTIALS, ANONYMOUS_USER
 
         try:
-            user_data = decode_access_token(
+            user_data = await async_decode_access_token(
                 encrypted_access_token=access_token,
                 public_key=self.public_key,
                 key_pair_type=self.key_pair_type,
             )
         except KeyDecodeError:
-            log.debug("tk.starlette.auth.no_decode")
+            logger.debug("tk.starlette.auth.no_decode", client=conn.client)
             raise AuthenticationDecodeError("Could not decode token")
         except KeyExpiredError:
-            log.debug("tk.starlette.auth.expired")
+            logger.debug("tk.starlette.auth.expired", client=conn.client)
             raise AuthenticationExpiredError("Token expired")
 
-        user = SOUser(
+        # user_data has already been validated by decode_access_token, so
+        # there is no need to validate it again here.
+        user = SOUser.model_construct(
             is_authenticated=True,
             display_name=user_data.user_name,
             user_id=user_data.user_id,
             full_name=user_data.full_name,
             email=user_data.email,
-            groups=user_data.group_names,
+            groups=frozenset(user_data.group_names or ()),
         )
 
-        log = log.bind(**user.model_dump())
+        credentials = AuthCredentials(user_data.grants or ())
 
-        credentials = AuthCredentials(user_data.grants)
+        # Lets the FastAPI dependencies re-use this decode.
+        conn.state.soauth_user_data = user_data
 
-        log = log.bind(grants=user_data.grants)
-        log.debug("tk.starlette.auth.success")
+        logger.debug(
+            "tk.starlette.auth.success",
+            client=conn.client,
+            user_id=user.user_id,
+            display_name=user.display_name,
+            grants=credentials.scopes,
+        )
 
         return credentials, user
 
@@ -246,6 +336,55 @@ class MockSOAuthCookieBackend(AuthenticationBackend):
         return credentials, user
 
 
+def _set_token_cookies(
+    response: Response,
+    content: KeyRefreshResponse,
+    access_token_name: str,
+    refresh_token_name: str,
+    use_refresh_token: bool,
+):
+    """
+    Set the token cookies (and their javascript-visible companions) from a
+    key refresh or code exchange. All of the cookies share one of two expiry
+    times, so each is formatted once rather than once per cookie.
+    """
+
+    access_expires = format_datetime(content.access_token_expires, usegmt=True)
+    refresh_expires = format_datetime(content.refresh_token_expires, usegmt=True)
+
+    cookies = [
+        (access_token_name, content.access_token, access_expires, True),
+        ("valid_access_token", "True", access_expires, False),
+        ("profile_data", json.dumps(content.profile_data), access_expires, False),
+    ]
+
+    if use_refresh_token:
+        cookies += [
+            (refresh_token_name, content.refresh_token, refresh_expires, True),
+            ("valid_refresh_token", "True", refresh_expires, False),
+        ]
+
+    for key, value, expires, httponly in cookies:
+        response.set_cookie(key=key, value=value, expires=expires, httponly=httponly)
+
+
+def _restart_login_redirect(
+    url: str | URL, access_token_name: str, refresh_token_name: str
+) -> RedirectResponse:
+    """
+    When a refresh fails, the best thing we can do is send users back where
+    they came from without their tokens, and make them run the login flow
+    again.
+    """
+
+    response = RedirectResponse(url, status_code=302)
+
+    response.delete_cookie(access_token_name)
+    response.delete_cookie(refresh_token_name)
+
+    return response
+
+
 def key_expired_handler(request: Request, exc: KeyExpiredError) -> RedirectResponse:
     """
     Handles the KeyExpiredError exception that occurs when the authentication
@@ -265,10 +404,9 @@ def key_expired_handler(request: Request, exc: KeyExpiredError) -> RedirectRespo
     access_token_name = getattr(request.app, "access_token_name", "access_token")
     use_refresh_token = getattr(request.app, "use_refresh_token", True)
 
-    refresh_key = request.cookies[refresh_token_name]
+    refresh_key = request.cookies.get(refresh_token_name)
 
-    log = get_logger()
-    log = log.bind(
+    log = logger.bind(
         orginal_url=request.url,
         refresh_token_name=refresh_token_name,
         access_token_name=access_token_name,
@@ -279,71 +417,57 @@ def key_expired_handler(request: Request, exc: KeyExpiredError) -> RedirectRespo
         log.info("tk.starlette.expired.no_token")
         raise KeyDecodeError("You do not have a refresh token, go get one!")
 
-    with httpx.Client() as client:
-        log = log.bind(refresh_key_url=request.app.refresh_url)
-        try:
-            response = client.post(
-                request.app.refresh_url, json={"refresh_token": refresh_key}
-            )
-        except httpx.ReadTimeout:
-            log.info("tk.starlette.expired.refresh_timeout")
-
-            # Best thing we can do is send them back where they came from, and make them run
-            # the login flow again.
-            response = RedirectResponse(request.url, status_code=302)
-
-            response.delete_cookie(access_token_name)
-            response.delete_cookie(refresh_token_name)
-            return response
+    log = log.bind(refresh_key_url=request.app.refresh_url)
 
-        if response.status_code != 200:
-            log = log.bind(status_code=response.status_code, content=response.content)
-            log.info("tk.starlette.expired.cannot_refresh_key")
+    # Several requests carrying the same expired token often arrive at once
+    # (e.g. a page and its assets). Only the first may exchange the refresh
+    # token, as that invalidates it; the rest re-use the result.
+    digest = hashlib.sha256(refresh_key.encode("utf-8")).digest()
 
-            # Best thing we can do is send them back where they came from, and make them run
-            # the login flow again.
-            response = RedirectResponse(request.url, status_code=302)
+    with _refresh_lock(digest):
+        with _REFRESHED_LOCK:
+            content = _REFRESHED.get(digest)
 
-            response.delete_cookie(access_token_name)
-            response.delete_cookie(refresh_token_name)
-            return response
-
-        content = KeyRefreshResponse.model_validate_json(response.content)
+        if content is not None:
+            log.info("tk.starlette.expired.coalesced")
+        else:
+            try:
+                response = get_http_client().post(
+                    request.app.refresh_url, json={"refresh_token": refresh_key}
+                )
+            except httpx.ReadTimeout:
+                log.info("tk.starlette.expired.refresh_timeout")
+
+                return _restart_login_redirect(
+                    url=request.url,
+                    access_token_name=access_token_name,
+                    refresh_token_name=refresh_token_name,
+                )
+
+            if response.status_code != 200:
+                log = log.bind(
+                    status_code=response.status_code, content=response.content
+                )
+                log.info("tk.starlette.expired.cannot_refresh_key")
+
+                return _restart_login_redirect(
+                    url=request.url,
+                    access_token_name=access_token_name,
+                    refresh_token_name=refresh_token_name,
+                )
+
+            content = KeyRefreshResponse.model_validate_json(response.content)
+            with _REFRESHED_LOCK:
+                _REFRESHED[digest] = content
 
     response = RedirectResponse(request.url, status_code=302)
 
-    response.set_cookie(
-        access_token_name,
-        content.access_token,
-        httponly=True,
-        expires=content.access_token_expires,
-    )
-    response.set_cookie(
-        refresh_token_name,
-        content.refresh_token,
-        httponly=True,
-        expires=content.refresh_token_expires,
-    )
-
-    response.set_cookie(
-        key="valid_refresh_token",
-        value="True",
-        expires=content.refresh_token_expires,
-        httponly=False,
-    )
-
-    response.set_cookie(
-        key="valid_access_token",
-        value="True",
-        expires=content.access_token_expires,
-        httponly=False,
-    )
-
-    response.set_cookie(
-        key="profile_data",
-        value=json.dumps(content.profile_data),
-        expires=content.access_token_expires,
-        httponly=False,
+    _set_token_cookies(
+        response=response,
+        content=content,
+        access_token_name=access_token_name,
+        refresh_token_name=refresh_token_name,
+        use_refresh_token=True,
     )
 
     log.info("tk.starlette.expired.refreshed")
@@ -364,8 +488,7 @@ def key_decode_handler(request: Request, exc: KeyDecodeError) -> RedirectRespons
     access_token_name = getattr(request.app, "access_token_name", "access_token")
     use_refresh_token = getattr(request.app, "use_refresh_token", True)
 
-    log = get_logger()
-    log = log.bind(
+    log = logger.bind(
         orginal_url=request.url,
         refresh_token_name=refresh_token_name,
         access_token_name=access_token_name,
@@ -398,11 +521,10 @@ def unauthorized_handler(request: Request, exc: HTTPException) -> RedirectRespon
 def on_auth_error(request: Request, exc: Exception):
     if isinstance(exc, AuthenticationDecodeError):
         return key_decode_handler(request=request, exc=exc)
-    elif isinstance(exc, AuthenticationExpiredError):
-        return key_expired_handler(request=request, exc=exc)
-    else:
-        # By default, let's just redirect them and delete their cookies.
-        return key_expired_handler(request=request, exc=exc)
+
+    # Expired tokens, and by default anything else: try a refresh, which
+    # redirects them and deletes their cookies if it fails.
+    return key_expired_handler(request=request, exc=exc)
 
 
 def transform_auth_error(request: Request, exc: Exception):
@@ -435,13 +557,12 @@ async def handle_redirect(code: str, state: str, request: Request) -> RedirectRe
     """
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                request.app.code_url,
-                params=dict(code=code, secret=request.app.client_secret),
-            )
+        response = await _get_async_http_client().post(
+            request.app.code_url,
+            params=dict(code=code, secret=request.app.client_secret),
+        )
 
-            response.raise_for_status()
+        response.raise_for_status()
     except httpx.HTTPStatusError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Code exchange failed"
@@ -455,38 +576,12 @@ async def handle_redirect(code: str, state: str, request: Request) -> RedirectRe
     access_token_name = getattr(request.app, "access_token_name", "access_token")
     use_refresh_token = getattr(request.app, "use_refresh_token", True)
 
-    response.set_cookie(
-        key="valid_access_token",
-        value="True",
-        expires=content.access_token_expires,
-        httponly=False,
-    )
-    response.set_cookie(
-        key=access_token_name,
-        value=content.access_token,
-        expires=content.access_token_expires,
-        httponly=True,
-    )
-
-    if use_refresh_token:
-        response.set_cookie(
-            key="valid_refresh_token",
-            value="True",
-            expires=content.refresh_token_expires,
-            httponly=False,
-        )
-        response.set_cookie(
-            key=refresh_token_name,
-            value=content.refresh_token,
-            expires=content.refresh_token_expires,
-            httponly=True,
-        )
-
-    response.set_cookie(
-        key="profile_data",
-        value=json.dumps(content.profile_data),
-        expires=content.access_token_expires,
-        httponly=False,
+    _set_token_cookies(
+        response=response,
+        content=content,
+        access_token_name=access_token_name,
+        refresh_token_name=refresh_token_name,
+        use_refresh_token=use_refresh_token,
     )
 
     return response
@@ -514,7 +609,14 @@ async def logout(request: Request) -> RedirectResponse:
 
     if use_refresh_token:
         if cookie := request.cookies.get(refresh_token_name, None):
-            httpx.post(request.app.expire_url, json={"refresh_token": cookie})
+            try:
+                await _get_async_http_client().post(
+                    request.app.expire_url, json={"refresh_token": cookie}
+                )
+            except httpx.HTTPError:
+                # The cookies are cleared regardless; the refresh token will
+                # expire on its own.
+                logger.info("tk.starlette.logout.expire_failed")
 
     response.delete_cookie(refresh_token_name)
     response.delete_cookie(access_token_name)
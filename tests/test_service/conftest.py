@@ -16,6 +16,18 @@ def session_manager(server_settings: Settings, database):
     yield server_settings.async_manager()
 
 
+@pytest_asyncio.fixture(loop_scope="session")
+async def conn(session_manager):
+    """
+    A session with a transaction already begun (and committed at the end of
+    the test), for tests that do not need to check state across separate
+    transactions.
+    """
+    async with session_manager.session() as conn:
+        async with conn.begin():
+            yield conn
+
+
 @pytest_asyncio.fixture(scope="session")
 def logger():
     yield structlog.get_logger()
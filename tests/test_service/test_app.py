@@ -5,6 +5,7 @@ Test for app creation/deletion functionality
 import pytest
 
 from soauth.service import app as app_service
+from soauth.service import refresh as refresh_service
 from soauth.service import user as user_service
 
 
@@ -39,12 +40,19 @@ async def test_create_app(user, session_manager, server_settings, logger):
             OLD_KEY = app.private_key
             OLD_CLIENT_SECRET = app.client_secret
 
+            await refresh_service._get_verifier(app_id=APP_ID, conn=conn)
+
     async with session_manager.session() as conn:
         async with conn.begin():
             await app_service.refresh_keys(
                 app_id=APP_ID, settings=server_settings, conn=conn, log=logger
             )
 
+            # The cached key is only dropped once the rotation is committed.
+            assert APP_ID in refresh_service._APP_KEY_CACHE
+
+    assert APP_ID not in refresh_service._APP_KEY_CACHE
+
     async with session_manager.session() as conn:
         async with conn.begin():
             app = await app_service.read_by_id(
@@ -118,3 +118,31 @@ async def test_create_refresh_key(
             old_key = await conn.get(RefreshKey, REFRESHED_KEY_ID)
             assert old_key.used == 0
             assert old_key.revoked
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_expire_refresh_keys_by_ids(user, app, session_manager, server_settings):
+    async with session_manager.session() as conn:
+        async with conn.begin():
+            KEY_IDS = []
+
+            for _ in range(2):
+                _, refresh_key = await refresh_service.create_refresh_key(
+                    user=await user_service.read_by_id(user, conn),
+                    app=await app_service.read_by_id(app, conn),
+                    api_key=True,
+                    settings=server_settings,
+                    conn=conn,
+                )
+                KEY_IDS.append(refresh_key.refresh_key_id)
+
+    async with session_manager.session() as conn:
+        async with conn.begin():
+            await refresh_service.expire_refresh_keys_by_ids(key_ids=KEY_IDS, conn=conn)
+
+    async with session_manager.session() as conn:
+        async with conn.begin():
+            for key_id in KEY_IDS:
+                key = await conn.get(RefreshKey, key_id)
+                assert key.revoked
+                assert key.used == 0
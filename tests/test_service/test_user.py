@@ -2,12 +2,23 @@
 Tests the user service
 """
 
+import asyncio
+
 import pytest
+from sqlalchemy import or_, select
 
+from soauth.database.group import GroupMembership
 from soauth.service import groups as group_service
 from soauth.service import user as user_service
 
 
+async def _expect_user_not_found(read, session_manager, **kwargs):
+    with pytest.raises(user_service.UserNotFound):
+        async with session_manager.session() as conn:
+            async with conn.begin():
+                await read(conn=conn, **kwargs)
+
+
 @pytest.mark.asyncio(loop_scope="session")
 async def test_create_user(server_settings, session_manager, logger):
     async with session_manager.session() as conn:
@@ -25,12 +36,12 @@ async def test_create_user(server_settings, session_manager, logger):
             USER_ID = user.user_id
             USER_NAME = user.user_name
 
-    async with session_manager.session() as conn:
-        async with conn.begin():
             await user_service.add_grant(
                 user_name="test_user", grant="test_grant", conn=conn, log=logger
             )
 
+    # Each change is checked in a fresh transaction so that we read what was
+    # committed rather than the objects held by the session.
     async with session_manager.session() as conn:
         async with conn.begin():
             user = await user_service.read_by_id(user_id=USER_ID, conn=conn)
@@ -38,8 +49,6 @@ async def test_create_user(server_settings, session_manager, logger):
             assert len(user.groups) > 0
             assert user.has_effective_grant("test_grant")
 
-    async with session_manager.session() as conn:
-        async with conn.begin():
             await user_service.remove_grant(
                 user_name="test_user", grant="test_grant", conn=conn, log=logger
             )
@@ -50,19 +59,17 @@ async def test_create_user(server_settings, session_manager, logger):
 
             assert not user.has_effective_grant("test_grant")
 
-    async with session_manager.session() as conn:
-        async with conn.begin():
             await user_service.delete(user_name="test_user", conn=conn, log=logger)
 
-    with pytest.raises(user_service.UserNotFound):
-        async with session_manager.session() as conn:
-            async with conn.begin():
-                user = await user_service.read_by_id(user_id=USER_ID, conn=conn)
-
-    with pytest.raises(user_service.UserNotFound):
-        async with session_manager.session() as conn:
-            async with conn.begin():
-                user = await user_service.read_by_name(user_name=USER_NAME, conn=conn)
+    # Independent reads, each on its own session, so they can run concurrently.
+    await asyncio.gather(
+        _expect_user_not_found(
+            user_service.read_by_id, session_manager, user_id=USER_ID
+        ),
+        _expect_user_not_found(
+            user_service.read_by_name, session_manager, user_name=USER_NAME
+        ),
+    )
 
 
 @pytest.mark.asyncio(loop_scope="session")
@@ -108,8 +115,6 @@ async def test_user_effective_grants_with_group(
             assert user.has_effective_grant("another_group_grant")
             assert not user.has_effective_grant("non_existent_grant")
 
-    async with session_manager.session() as conn:
-        async with conn.begin():
             # Delete the group
             await group_service.delete_group(group_id=GROUP_ID, conn=conn, log=logger)
 
@@ -138,11 +143,65 @@ async def test_user_with_no_groups(server_settings, session_manager, logger):
     async with session_manager.session() as conn:
         async with conn.begin():
             user = await user_service.read_by_id(user_id=USER_ID, conn=conn)
-            user.to_core(include_groups=True)
             assert len(user.groups) == 0
 
+            core = user.to_core(include_groups=True)
+            assert core.group_names == []
+            assert core.group_ids == []
+
+            await user_service.delete(
+                user_name="test_user_no_groups", conn=conn, log=logger
+            )
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_delete_user_removes_memberships(
+    server_settings, session_manager, logger, user
+):
+    async with session_manager.session() as conn:
+        async with conn.begin():
+            member = await user_service.create(
+                user_name="test_user_memberships",
+                email="test_user_memberships@email.com",
+                full_name="Test User Memberships",
+                profile_image=None,
+                grants="",
+                conn=conn,
+                log=logger,
+            )
+            USER_ID = member.user_id
+            PERSONAL_GROUP_ID = member.groups[0].group_id
+
+            # Created by the admin user, so that it outlives the member.
+            group = await group_service.create(
+                group_name="test_group_memberships",
+                created_by_user_id=user,
+                member_ids=[USER_ID],
+                grants="",
+                conn=conn,
+                log=logger,
+            )
+            GROUP_ID = group.group_id
+
     async with session_manager.session() as conn:
         async with conn.begin():
             await user_service.delete(
-                user_name="test_user_no_groups", conn=conn, log=logger
+                user_name="test_user_memberships", conn=conn, log=logger
             )
+
+    async with session_manager.session() as conn:
+        async with conn.begin():
+            memberships = (
+                await conn.execute(
+                    select(GroupMembership).where(
+                        or_(
+                            GroupMembership.user_id == USER_ID,
+                            GroupMembership.group_id == PERSONAL_GROUP_ID,
+                        )
+                    )
+                )
+            ).all()
+
+            assert memberships == []
+
+            await group_service.delete_group(group_id=GROUP_ID, conn=conn, log=logger)
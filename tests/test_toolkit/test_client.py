@@ -0,0 +1,71 @@
+"""
+Tests for the API client toolkit
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from soauth.toolkit.client import (
+    SOAuth,
+    TokenData,
+    _refresh_deadline,
+    _write_private,
+)
+
+
+def test_refresh_deadline_is_wall_clock():
+    expires = datetime.now(tz=timezone.utc) + timedelta(hours=1)
+    token_data = TokenData(
+        access_token="access", refresh_token="refresh", access_token_expires=expires
+    )
+
+    deadline = _refresh_deadline(token_data)
+
+    assert deadline == (expires - timedelta(minutes=5)).timestamp()
+    assert deadline > time.time()
+
+
+def test_refresh_deadline_without_access_token():
+    assert _refresh_deadline(TokenData(refresh_token="refresh")) == 0.0
+
+
+def test_soauth_exchanges_expired_token(tmp_path, monkeypatch):
+    auth = SOAuth("test", api_key="refresh", serialization_directory=tmp_path)
+    auth._set_token_data(
+        TokenData(
+            access_token="old",
+            refresh_token="refresh",
+            access_token_expires=datetime.now(tz=timezone.utc) + timedelta(minutes=1),
+        )
+    )
+
+    exchanges = []
+
+    def exchange(refresh_token: str):
+        exchanges.append(refresh_token)
+        auth._set_token_data(
+            TokenData(
+                access_token="new",
+                refresh_token=refresh_token,
+                access_token_expires=datetime.now(tz=timezone.utc) + timedelta(hours=1),
+            )
+        )
+
+    monkeypatch.setattr(auth, "sync_exchange_with_identity_server", exchange)
+
+    # Within the refresh margin of expiry, so the token is exchanged.
+    assert auth.sync_get_token() == "new"
+    # Fresh, so it is returned without another exchange.
+    assert auth.sync_get_token() == "new"
+    assert exchanges == ["refresh"]
+
+
+def test_write_private_fixes_existing_mode(tmp_path):
+    path = tmp_path / "token"
+    path.write_bytes(b"old")
+    path.chmod(0o644)
+
+    _write_private(path, b"new")
+
+    assert path.read_bytes() == b"new"
+    assert path.stat().st_mode & 0o777 == 0o600
@@ -0,0 +1,61 @@
+"""
+Tests for the FastAPI toolkit
+"""
+
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from soauth.core.cryptography import generate_key_pair
+from soauth.toolkit.fastapi import (
+    AuthenticatedUserDependency,
+    SOUserWithGrants,
+    global_setup,
+    handle_authenticated_user,
+)
+
+
+@pytest.fixture
+def client():
+    public_key, _ = generate_key_pair(key_pair_type="Ed25519", key_password="test")
+
+    app = global_setup(
+        app=FastAPI(),
+        app_base_url="http://testserver",
+        authentication_base_url="http://auth.testserver",
+        app_id="00000000-0000-0000-0000-000000000001",
+        client_secret="secret",
+        public_key=public_key.decode("utf-8"),
+        key_pair_type="Ed25519",
+    )
+
+    @app.get("/protected")
+    async def protected(user: SOUserWithGrants = Depends(handle_authenticated_user)):
+        return {"user_name": user.display_name}
+
+    @app.get("/dependency")
+    async def dependency(user: AuthenticatedUserDependency):
+        return {"user_name": user.display_name}
+
+    @app.get("/direct")
+    async def direct(request: Request):
+        user = await handle_authenticated_user(request=request)
+        return {"user_name": user.display_name}
+
+    with TestClient(app, follow_redirects=False) as client:
+        yield client
+
+
+def test_empty_access_token_redirects_to_login(client):
+    client.cookies.set("access_token", "")
+    response = client.get("/protected")
+
+    assert response.status_code == 302
+    assert response.headers["location"] == client.app.login_url
+
+
+@pytest.mark.parametrize("path", ["/protected", "/dependency", "/direct"])
+def test_no_access_token_is_unauthorized(client, path):
+    response = client.get(path)
+
+    assert response.status_code == 401
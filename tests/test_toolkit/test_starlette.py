@@ -0,0 +1,104 @@
+"""
+Tests for the Starlette toolkit
+"""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from cachetools import TTLCache
+from starlette.requests import Request
+
+from soauth.core.cryptography import generate_key_pair
+from soauth.core.models import KeyRefreshResponse
+from soauth.toolkit import starlette
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _request(headers: list[tuple[bytes, bytes]]) -> Request:
+    app = SimpleNamespace(refresh_url="http://auth.testserver/exchange")
+
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("testserver", 80),
+            "path": "/",
+            "root_path": "",
+            "query_string": b"",
+            "headers": headers,
+            "app": app,
+        }
+    )
+
+
+def _expired_request(refresh_token: str) -> Request:
+    return _request(headers=[(b"cookie", f"refresh_token={refresh_token}".encode())])
+
+
+def test_spent_refresh_token_only_honoured_for_grace_period(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(
+        starlette,
+        "_REFRESHED",
+        TTLCache(maxsize=16, ttl=starlette._REFRESH_GRACE_SECONDS, timer=clock),
+    )
+
+    now = datetime.now(tz=timezone.utc)
+    content = KeyRefreshResponse(
+        access_token="new_access",
+        refresh_token="new_refresh",
+        profile_data={},
+        access_token_expires=now + timedelta(hours=1),
+        refresh_token_expires=now + timedelta(days=1),
+    )
+
+    exchanges = []
+
+    def post(url, json):
+        exchanges.append(json["refresh_token"])
+        return httpx.Response(200, content=content.model_dump_json())
+
+    monkeypatch.setattr(
+        starlette, "get_http_client", lambda: SimpleNamespace(post=post)
+    )
+
+    for _ in range(2):
+        response = starlette.key_expired_handler(
+            request=_expired_request("spent"), exc=None
+        )
+        assert response.status_code == 302
+
+    # Requests racing the first exchange re-use its result.
+    assert exchanges == ["spent"]
+
+    # After the grace period the spent token goes back to the server.
+    clock.now += starlette._REFRESH_GRACE_SECONDS + 1
+    starlette.key_expired_handler(request=_expired_request("spent"), exc=None)
+
+    assert exchanges == ["spent", "spent"]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_anonymous_credentials_are_immutable():
+    backend = starlette.SOAuthCookieBackend(
+        public_key=generate_key_pair(key_pair_type="Ed25519", key_password="test")[0],
+        key_pair_type="Ed25519",
+    )
+
+    credentials, user = await backend.authenticate(_request(headers=[]))
+
+    assert not user.is_authenticated
+    assert credentials.scopes == ()
+
+    with pytest.raises(AttributeError):
+        credentials.scopes.append("admin")